@@ -0,0 +1,424 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+PPP benchmark suite.
+Generates synthetic books (text-only, image-heavy and mixed page sizes)
+and times each PPP stage on them in a fresh child process, reporting wall
+time, CPU time (including external tools), peak RSS and output bytes.
+
+    python benchmarks/bench.py                      # quick corpus, print table
+    python benchmarks/bench.py --full               # up to 5,000 pages
+    python benchmarks/bench.py --compare benchmarks/baseline.json
+    python benchmarks/bench.py --save benchmarks/baseline.json
+
+--compare exits 1 if any stage got slower or hungrier than the baseline
+by more than the tolerance, so it can gate a release.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), 'src'))
+
+import PyPDF2
+from PyPDF2.generic import (
+    DecodedStreamObject,
+    DictionaryObject,
+    NameObject,
+    NumberObject,
+)
+
+KINDS = ['text', 'image', 'mixed']
+QUICK_SIZES = [8, 64, 500]
+FULL_SIZES = [8, 64, 500, 5000]
+STAGES = ['get_page_count', 'suggest_signature_sizes', 'pad_pdf', 'split_into_signatures',
+          'singledingle', 'impose_4up', 'flippar', 'combine_signatures']
+
+# External tools a stage cannot run without; missing ones skip the stage
+STAGE_TOOLS = {
+    'flippar': ('pdftops', 'pstops', 'ps2pdf'),
+}
+
+MIXED_SIZES = [(396, 612), (612, 792), (419.5, 595.3), (595.3, 841.9)]
+LOREM = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor '
+         'incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud '
+         'exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat.').split()
+
+
+# ---------------------------------------------------------------- corpora
+
+def _text_ops(rng, page_number, width, height):
+    lines = []
+    y = height - 54
+    while y > 54:
+        words = [rng.choice(LOREM) for _ in range(int((width - 72) // 30))]
+        lines.append(f'1 0 0 1 36 {y:.1f} Tm ({" ".join(words)}) Tj')
+        y -= 13
+    lines.append(f'1 0 0 1 {width / 2:.1f} 30 Tm ({page_number}) Tj')
+    return 'BT /F1 10 Tf\n' + '\n'.join(lines) + '\nET'
+
+
+def _image(writer, rng, size=128):
+    """A noise image, so every page carries data that does not compress."""
+    image = DecodedStreamObject()
+    image.set_data(zlib.compress(rng.randbytes(size * size * 3), 1))
+    image.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Image'),
+        NameObject('/Width'): NumberObject(size),
+        NameObject('/Height'): NumberObject(size),
+        NameObject('/ColorSpace'): NameObject('/DeviceRGB'),
+        NameObject('/BitsPerComponent'): NumberObject(8),
+        NameObject('/Filter'): NameObject('/FlateDecode'),
+    })
+    return writer._add_object(image)
+
+
+def make_book(path, kind, pages, seed=1):
+    """Write a synthetic book of the given kind and page count to path."""
+    rng = random.Random(f'{kind}-{pages}-{seed}')
+    writer = PyPDF2.PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    }))
+
+    for n in range(1, pages + 1):
+        width, height = MIXED_SIZES[n % len(MIXED_SIZES)] if kind == 'mixed' else (396, 612)
+        resources = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font}),
+        })
+        ops = _text_ops(rng, n, width, height)
+        if kind == 'image':
+            resources[NameObject('/XObject')] = DictionaryObject(
+                {NameObject('/Im1'): _image(writer, rng)})
+            ops = f'q {width - 72:.1f} 0 0 {height / 2:.1f} 36 {height / 4:.1f} cm /Im1 Do Q\n' + ops
+
+        content = DecodedStreamObject()
+        content.set_data(ops.encode('latin-1'))
+        page = PyPDF2.PageObject.create_blank_page(None, width, height)
+        page[NameObject('/Resources')] = resources
+        page[NameObject('/Contents')] = writer._add_object(content.flate_encode())
+        writer.add_page(page)
+
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+
+def corpus(corpus_dir, sizes, kinds=KINDS):
+    """Generate (or reuse) the corpus; returns a list of (name, path)."""
+    os.makedirs(corpus_dir, exist_ok=True)
+    books = []
+    for kind in kinds:
+        for pages in sizes:
+            name = f'{kind}-{pages}'
+            path = os.path.join(corpus_dir, f'{name}.pdf')
+            if not os.path.isfile(path):
+                print(f'  generating {name}.pdf ...', file=sys.stderr)
+                make_book(path, kind, pages)
+            books.append((name, path))
+    return books
+
+
+# ----------------------------------------------------------------- stages
+# Each stage does its untimed setup in workdir and returns the callable to
+# time. They run inside the child process, with workdir as the cwd.
+
+def _signature_sizes(page_count):
+    from ppp.planner import plan_signatures
+    plans = plan_signatures(page_count, max_blank_pages=0, limit=1)
+    return plans[0].sig_sizes if plans else [page_count]
+
+
+def _stage_get_page_count(source, workdir):
+    from ppp.workflow import get_page_count
+    return lambda: get_page_count(source)
+
+
+def _stage_suggest_signature_sizes(source, workdir):
+    from ppp.workflow import get_page_count, suggest_signature_sizes
+    return lambda: suggest_signature_sizes(get_page_count(source))
+
+
+def _stage_pad_pdf(source, workdir):
+    from ppp.workflow import pad_pdf
+
+    def run():
+        if pad_pdf(source, 3, workdir=workdir) is None:
+            raise RuntimeError('pad_pdf failed')
+    return run
+
+
+def _stage_split_into_signatures(source, workdir):
+    from ppp.workflow import get_page_count, split_into_signatures
+    sizes = _signature_sizes(get_page_count(source))
+
+    def run():
+        if not split_into_signatures(source, sizes, workdir):
+            raise RuntimeError('split_into_signatures failed')
+    return run
+
+
+def _stage_singledingle(source, workdir):
+    from ppp.shell import singledingle
+    return lambda: singledingle(source)
+
+
+def _stage_impose_4up(source, workdir):
+    from ppp.shell import impose_4up
+    return lambda: impose_4up(source)
+
+
+def _stage_flippar(source, workdir):
+    from ppp.shell import flippar
+    return lambda: flippar(source)
+
+
+def _stage_combine_signatures(source, workdir):
+    from ppp import pageplan
+    from ppp.workflow import combine_signatures, get_page_count
+    signatures = pageplan.split(pageplan.source_pages(source), _signature_sizes(get_page_count(source)))
+    for i, pages in enumerate(signatures, 1):
+        pageplan.write_pdf(pageplan.impose(pages), os.path.join(workdir, f'{str(i).zfill(2)}.pdf'))
+
+    def run():
+        if not combine_signatures(workdir, workers=1):
+            raise RuntimeError('combine_signatures failed')
+    return run
+
+
+def _maxrss_bytes(usage):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def _own_peak_rss():
+    """
+    This process's peak RSS. On Linux ru_maxrss carries over the parent's
+    peak from before exec, so prefer VmHWM, which starts afresh.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return _maxrss_bytes(resource.getrusage(resource.RUSAGE_SELF))
+
+
+def _files(workdir):
+    found = {}
+    for root, _, names in os.walk(workdir):
+        for name in names:
+            path = os.path.join(root, name)
+            found[path] = os.path.getsize(path)
+    return found
+
+
+def run_stage(stage, source, workdir):
+    """Set up and time one stage in this process. Returns a metrics dict."""
+    from ppp import cache
+    cache.configure(enabled=False)
+    os.chdir(workdir)
+    fn = globals()[f'_stage_{stage}'](source, workdir)
+    before = _files(workdir)
+
+    self0 = resource.getrusage(resource.RUSAGE_SELF)
+    child0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    status = 'ok'
+    error = None
+    try:
+        fn()
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            status, error = 'error', f'exited with {e.code}'
+    except Exception as e:
+        status, error = 'error', f'{type(e).__name__}: {e}'
+    wall = time.perf_counter() - start
+    self1 = resource.getrusage(resource.RUSAGE_SELF)
+    child1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    after = _files(workdir)
+    output_bytes = sum(size for path, size in after.items() if before.get(path) != size)
+    cpu = ((self1.ru_utime - self0.ru_utime) + (self1.ru_stime - self0.ru_stime)
+           + (child1.ru_utime - child0.ru_utime) + (child1.ru_stime - child0.ru_stime))
+    return {
+        'status': status,
+        'error': error,
+        'wall_s': round(wall, 4),
+        'cpu_s': round(cpu, 4),
+        'peak_rss_bytes': max(_own_peak_rss(), _maxrss_bytes(child1)),
+        'output_bytes': output_bytes,
+    }
+
+
+def measure(stage, source):
+    """Run one stage in a fresh interpreter so peak RSS is its own."""
+    missing = [tool for tool in STAGE_TOOLS.get(stage, ()) if shutil.which(tool) is None]
+    if missing:
+        return {'status': 'skipped', 'error': f'needs {", ".join(missing)}',
+                'wall_s': None, 'cpu_s': None, 'peak_rss_bytes': None, 'output_bytes': None}
+    with tempfile.TemporaryDirectory(prefix='ppp-bench-') as workdir:
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-stage', stage, source, workdir],
+            capture_output=True, text=True)
+    try:
+        return json.loads(result.stdout)
+    except (IndexError, ValueError):
+        return {'status': 'error', 'error': (result.stderr.strip().splitlines() or ['no output'])[-1],
+                'wall_s': None, 'cpu_s': None, 'peak_rss_bytes': None, 'output_bytes': None}
+
+
+# -------------------------------------------------------------- reporting
+
+def _mb(value):
+    return '-' if value is None else f'{value / 1e6:.1f}'
+
+
+def _s(value):
+    return '-' if value is None else f'{value:.3f}'
+
+
+def print_table(results):
+    print(f'{"book":<12} {"stage":<24} {"wall s":>9} {"cpu s":>9} {"rss MB":>8} {"out MB":>8}  status')
+    for r in results:
+        status = r['status'] if r['status'] == 'ok' else f'{r["status"]}: {r["error"]}'
+        print(f'{r["book"]:<12} {r["stage"]:<24} {_s(r["wall_s"]):>9} {_s(r["cpu_s"]):>9} '
+              f'{_mb(r["peak_rss_bytes"]):>8} {_mb(r["output_bytes"]):>8}  {status}')
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'PyPDF2': PyPDF2.__version__,
+        'tools': {tool: shutil.which(tool) is not None
+                  for tool in ('gs', 'pdftk', 'pdftops', 'psbook', 'pstops', 'ps2pdf')},
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline, time_tolerance, rss_tolerance, noise_s=0.05):
+    """
+    List regressions against a baseline: stages that got slower than
+    time_tolerance (a fraction) beyond noise_s seconds, used more than
+    rss_tolerance more memory, or stopped working.
+    """
+    base = {(r['book'], r['stage']): r for r in baseline['results']}
+    problems = []
+    for r in results:
+        b = base.get((r['book'], r['stage']))
+        if b is None or b['status'] != 'ok':
+            continue
+        name = f'{r["book"]}/{r["stage"]}'
+        if r['status'] == 'skipped':
+            continue
+        if r['status'] != 'ok':
+            problems.append(f'{name}: now fails ({r["error"]})')
+            continue
+        if r['wall_s'] > b['wall_s'] * (1 + time_tolerance) and r['wall_s'] - b['wall_s'] > noise_s:
+            problems.append(f'{name}: wall {b["wall_s"]:.3f}s -> {r["wall_s"]:.3f}s')
+        if r['peak_rss_bytes'] > b['peak_rss_bytes'] * (1 + rss_tolerance):
+            problems.append(f'{name}: peak RSS {_mb(b["peak_rss_bytes"])} MB -> '
+                            f'{_mb(r["peak_rss_bytes"])} MB')
+    return problems
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark PPP stages on synthetic books.')
+    parser.add_argument('--full', action='store_true', help='include 5,000-page books')
+    parser.add_argument('--sizes', type=lambda t: [int(n) for n in t.split(',')],
+                        help='page counts to generate, e.g. 8,64 (overrides --full)')
+    parser.add_argument('--kinds', type=lambda t: t.split(','), default=KINDS,
+                        help=f'book kinds (default: {",".join(KINDS)})')
+    parser.add_argument('--stages', type=lambda t: t.split(','), default=STAGES,
+                        help=f'stages to time (default: all: {",".join(STAGES)})')
+    parser.add_argument('--corpus-dir', default=os.path.join(tempfile.gettempdir(), 'ppp-bench-corpus'),
+                        help='where generated books are kept between runs')
+    parser.add_argument('--json', metavar='FILE', help='write results as JSON')
+    parser.add_argument('--save', metavar='FILE', help='write results as a new baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare against a baseline')
+    parser.add_argument('--time-tolerance', type=float, default=0.25,
+                        help='allowed slowdown before --compare fails (default: 0.25 = 25%%)')
+    parser.add_argument('--rss-tolerance', type=float, default=0.25,
+                        help='allowed peak RSS growth before --compare fails (default: 0.25)')
+    parser.add_argument('--run-stage', nargs=3, metavar=('STAGE', 'SOURCE', 'WORKDIR'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f'unknown stage(s): {", ".join(sorted(unknown))}')
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.run_stage:
+        stage, source, workdir = args.run_stage
+        # The stage and the tools it runs chatter on stdout; keep the real
+        # stdout for the result line alone.
+        sys.stdout.flush()
+        result_fd = os.dup(1)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        os.close(devnull)
+        result = run_stage(stage, source, workdir)
+        sys.stdout.flush()
+        with os.fdopen(result_fd, 'w') as out:
+            out.write(json.dumps(result) + '\n')
+        return
+
+    sizes = args.sizes or (FULL_SIZES if args.full else QUICK_SIZES)
+    books = corpus(args.corpus_dir, sizes, args.kinds)
+
+    results = []
+    for name, path in books:
+        for stage in args.stages:
+            print(f'  {name}: {stage} ...', file=sys.stderr)
+            results.append({'book': name, 'stage': stage, 'input_bytes': os.path.getsize(path),
+                            **measure(stage, path)})
+
+    print_table(results)
+    report = {'environment': environment(), 'results': results}
+    for path in (args.json, args.save):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline, args.time_tolerance, args.rss_tolerance)
+        if problems:
+            print(f'\n{len(problems)} regression(s) against {args.compare}:')
+            for problem in problems:
+                print(f'  {problem}')
+            sys.exit(1)
+        print(f'\nNo regressions against {args.compare}.')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,2 +1,34 @@
 """Paul's Preponderating Prepresser - PDF prepress toolkit."""
 __version__ = "1.1.0"
+
+# The Python API (see ppp.api), imported on first use so that the command
+# line tools do not pay for it
+__all__ = [
+    'ImposeError',
+    'ImposeResult',
+    'InputError',
+    'MergeResult',
+    'PadResult',
+    'PlanError',
+    'PPPError',
+    'Progress',
+    'Signature',
+    'impose_pdf',
+    'impose_signatures',
+    'merge_pdfs',
+    'pad_pdf',
+    'page_count',
+    'plan',
+    'split_signatures',
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from ppp import api
+        return getattr(api, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
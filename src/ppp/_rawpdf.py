@@ -0,0 +1,591 @@
+"""
+Minimal random-access PDF reader used by PPP's fast paths.
+
+Reads only what it is asked for: the trailer, the cross-reference
+sections and whichever objects get resolved. It understands classic xref
+tables, xref streams and object streams (FlateDecode with PNG/TIFF
+predictors), which covers the files PPP produces and consumes. Anything
+it cannot handle raises RawPdfError so callers can fall back to PyPDF2.
+"""
+
+import mmap
+import re
+import zlib
+from collections import namedtuple
+
+
+class RawPdfError(Exception):
+    """The file uses a construct this reader does not handle, or is damaged."""
+
+
+Ref = namedtuple('Ref', ['num', 'gen'])
+
+
+class Name(str):
+    """A PDF name, stored with its leading slash (e.g. '/Type')."""
+
+
+class Stream:
+    """A stream object: its dictionary plus the location of its raw data."""
+
+    def __init__(self, dictionary, data):
+        self.dict = dictionary
+        self.raw = data
+
+    def __repr__(self):
+        return f'Stream({self.dict!r}, {len(self.raw)} bytes)'
+
+
+WHITESPACE = b'\x00\t\n\x0c\r '
+DELIMITERS = b'()<>[]{}/%'
+_SKIP = re.compile(rb'(?:[\x00\t\n\x0c\r ]+|%[^\r\n]*)*')
+_NUMBER = re.compile(rb'[+-]?(?:\d+\.?\d*|\.\d+)')
+_REF_TAIL = re.compile(rb'[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+R(?![^\x00\t\n\x0c\r ()<>\[\]{}/%])')
+_REGULAR = re.compile(rb'[^\x00\t\n\x0c\r ()<>\[\]{}/%]*')
+_NAME_ESCAPE = re.compile(rb'#([0-9A-Fa-f]{2})')
+_NAME_UNSAFE = re.compile(rb'[^\x21-\x7e]|[#()<>\[\]{}/%]')
+_OBJ_HEADER = re.compile(rb'\s*(\d+)\s+(\d+)\s+obj')
+_XREF_SUBSECTION = re.compile(rb'(\d+)\s+(\d+)')
+_XREF_ENTRY = re.compile(rb'\s*(\d{1,10})\s+(\d{1,5})\s+([nf])')
+_STRING_ESCAPES = {
+    ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t', ord('b'): b'\b',
+    ord('f'): b'\f', ord('('): b'(', ord(')'): b')', ord('\\'): b'\\',
+}
+
+
+def _skip(buf, pos):
+    return _SKIP.match(buf, pos).end()
+
+
+def _parse_literal_string(buf, pos):
+    """Parse a (literal) string starting after its opening parenthesis."""
+    out = bytearray()
+    depth = 1
+    while True:
+        if pos >= len(buf):
+            raise RawPdfError('unterminated string')
+        c = buf[pos]
+        if c == 0x5C:  # backslash
+            n = buf[pos + 1]
+            if n in _STRING_ESCAPES:
+                out += _STRING_ESCAPES[n]
+                pos += 2
+            elif 0x30 <= n <= 0x37:
+                digits = re.match(rb'[0-7]{1,3}', buf[pos + 1:pos + 4]).group()
+                out.append(int(digits, 8) & 0xFF)
+                pos += 1 + len(digits)
+            elif n in (0x0D, 0x0A):
+                pos += 2
+                if n == 0x0D and buf[pos:pos + 1] == b'\n':
+                    pos += 1
+            else:
+                out.append(n)
+                pos += 2
+            continue
+        if c == 0x28:
+            depth += 1
+        elif c == 0x29:
+            depth -= 1
+            if depth == 0:
+                return bytes(out), pos + 1
+        out.append(c)
+        pos += 1
+
+
+def parse_object(buf, pos):
+    """Parse one object at pos; returns (value, position after it)."""
+    pos = _skip(buf, pos)
+    c = buf[pos:pos + 1]
+
+    if c == b'/':
+        end = _REGULAR.match(buf, pos + 1).end()
+        raw = bytes(buf[pos + 1:end])
+        raw = _NAME_ESCAPE.sub(lambda m: bytes([int(m.group(1), 16)]), raw)
+        return Name('/' + raw.decode('latin-1')), end
+
+    if c == b'<':
+        if buf[pos + 1:pos + 2] == b'<':
+            result = {}
+            pos += 2
+            while True:
+                pos = _skip(buf, pos)
+                if buf[pos:pos + 2] == b'>>':
+                    pos += 2
+                    break
+                key, pos = parse_object(buf, pos)
+                if not isinstance(key, Name):
+                    raise RawPdfError(f'dictionary key {key!r} is not a name')
+                value, pos = parse_object(buf, pos)
+                result[key] = value
+            return result, pos
+        end = buf.find(b'>', pos)
+        if end < 0:
+            raise RawPdfError('unterminated hex string')
+        digits = re.sub(rb'[^0-9A-Fa-f]', b'', bytes(buf[pos + 1:end]))
+        if len(digits) % 2:
+            digits += b'0'
+        return bytes.fromhex(digits.decode('ascii')), end + 1
+
+    if c == b'[':
+        result = []
+        pos += 1
+        while True:
+            pos = _skip(buf, pos)
+            if buf[pos:pos + 1] == b']':
+                return result, pos + 1
+            value, pos = parse_object(buf, pos)
+            result.append(value)
+
+    if c == b'(':
+        return _parse_literal_string(buf, pos + 1)
+
+    m = _NUMBER.match(buf, pos)
+    if m:
+        text = m.group()
+        if b'.' in text:
+            return float(text), m.end()
+        ref = _REF_TAIL.match(buf, m.end())
+        if ref:
+            return Ref(int(text), int(ref.group(1))), ref.end()
+        return int(text), m.end()
+
+    end = _REGULAR.match(buf, pos).end()
+    word = bytes(buf[pos:end])
+    if word == b'true':
+        return True, end
+    if word == b'false':
+        return False, end
+    if word == b'null':
+        return None, end
+    raise RawPdfError(f'unexpected token {word[:20]!r} at offset {pos}')
+
+
+def serialize(value):
+    """
+    Write a parsed value back out as PDF syntax. Strings, which the parser
+    returns as bytes, are written in hex.
+    """
+    if isinstance(value, Name):
+        return b'/' + _NAME_UNSAFE.sub(lambda m: b'#%02X' % m.group()[0],
+                                       value[1:].encode('latin-1'))
+    if isinstance(value, Ref):
+        return b'%d %d R' % value
+    if isinstance(value, bool):
+        return b'true' if value else b'false'
+    if value is None:
+        return b'null'
+    if isinstance(value, int):
+        return b'%d' % value
+    if isinstance(value, float):
+        return (b'%.6f' % value).rstrip(b'0').rstrip(b'.') or b'0'
+    if isinstance(value, bytes):
+        return b'<' + value.hex().encode('ascii') + b'>'
+    if isinstance(value, list):
+        return b'[' + b' '.join(serialize(v) for v in value) + b']'
+    if isinstance(value, dict):
+        return b'<<' + b''.join(serialize(k) + b' ' + serialize(v) + b'\n'
+                                for k, v in value.items()) + b'>>'
+    raise RawPdfError(f'cannot write {type(value).__name__} values')
+
+
+def _unpredict(data, params):
+    """Undo PNG (10-15) or TIFF (2) predictors on decoded data."""
+    predictor = params.get('/Predictor', 1)
+    if predictor == 1:
+        return data
+    columns = params.get('/Columns', 1)
+    bpc = params.get('/BitsPerComponent', 8)
+    colors = params.get('/Colors', 1)
+    bpp = max(1, colors * bpc // 8)
+    rowlen = (columns * colors * bpc + 7) // 8
+
+    if predictor == 2:
+        if bpc != 8:
+            raise RawPdfError('TIFF predictor only supported for 8-bit components')
+        out = bytearray(data)
+        for row in range(0, len(out), rowlen):
+            for i in range(row + bpp, min(row + rowlen, len(out))):
+                out[i] = (out[i] + out[i - bpp]) & 0xFF
+        return bytes(out)
+
+    out = bytearray()
+    prev = bytearray(rowlen)
+    for row in range(0, len(data), rowlen + 1):
+        kind = data[row]
+        line = bytearray(data[row + 1:row + 1 + rowlen])
+        for i in range(len(line)):
+            left = line[i - bpp] if i >= bpp else 0
+            up = prev[i]
+            if kind == 1:
+                line[i] = (line[i] + left) & 0xFF
+            elif kind == 2:
+                line[i] = (line[i] + up) & 0xFF
+            elif kind == 3:
+                line[i] = (line[i] + ((left + up) >> 1)) & 0xFF
+            elif kind == 4:
+                upleft = prev[i - bpp] if i >= bpp else 0
+                p = left + up - upleft
+                pa, pb, pc = abs(p - left), abs(p - up), abs(p - upleft)
+                pred = left if pa <= pb and pa <= pc else up if pb <= pc else upleft
+                line[i] = (line[i] + pred) & 0xFF
+            elif kind != 0:
+                raise RawPdfError(f'unknown PNG predictor row type {kind}')
+        out += line
+        prev = line
+    return bytes(out)
+
+
+def _is_leaf(node):
+    return isinstance(node, dict) and '/Kids' not in node
+
+
+def descend_page_tree(root, index, resolve, flat=None):
+    """
+    Find page index below the page tree node root by /Count, touching only
+    the nodes on the way to it. Works on this module's objects and on
+    PyPDF2's alike: resolve maps a value that may be a reference to the
+    object itself.
+
+    A node whose kids are all single pages (the usual flat tree) is
+    indexed directly. /Count equal to the number of kids does not prove
+    that on its own, since an empty subtree beside a bigger one keeps the
+    sums equal, so the kids are checked once per node; flat, a dict kept
+    for as long as the document is open, remembers the answer.
+
+    Returns (page, its reference, the ancestors from root down). Raises
+    RawPdfError for an index out of range or a damaged tree.
+    """
+    if flat is None:
+        flat = {}
+    node, ref, ancestors = root, None, []
+    for _ in range(64):
+        if '/Kids' not in node:
+            if index != 0:
+                raise RawPdfError('page index out of range')
+            return node, ref, ancestors
+        ancestors.append(node)
+        kids = resolve(node['/Kids'])
+        if not isinstance(kids, list):
+            raise RawPdfError('bad page tree node')
+        if resolve(node.get('/Count')) == len(kids) and index < len(kids):
+            # With the page at either end, the single page it is decides it
+            if index in (0, len(kids) - 1):
+                direct = _is_leaf(resolve(kids[index]))
+            else:
+                # Keep the node alive so its id is not reused
+                direct = flat.get(id(node), (None, None))[1]
+                if direct is None:
+                    direct = all(_is_leaf(resolve(kid)) for kid in kids)
+                    flat[id(node)] = (node, direct)
+            if direct:
+                ref, node, index = kids[index], resolve(kids[index]), 0
+                continue
+        for kid_ref in kids:
+            kid = resolve(kid_ref)
+            if not isinstance(kid, dict):
+                raise RawPdfError('bad page tree node')
+            count = resolve(kid.get('/Count', 1)) if '/Kids' in kid else 1
+            if not isinstance(count, int):
+                raise RawPdfError('bad page count')
+            if index < count:
+                ref, node = kid_ref, kid
+                break
+            index -= count
+        else:
+            raise RawPdfError('page index out of range')
+    raise RawPdfError('page tree too deep')
+
+
+class RawPdf:
+    """
+    Lazily parsed PDF file.
+
+    Use as a context manager or call close(). Objects are parsed on
+    resolve() and cached; nothing else is read.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self.buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise RawPdfError('empty file')
+        self._sections = []  # cross-reference sections, newest first
+        self.trailer = {}
+        self.xref_is_stream = False
+        self._cache = {}
+        self._objstms = {}
+        self._flat_nodes = {}  # see descend_page_tree
+        try:
+            self.startxref = self._find_startxref()
+            self._load_xref_chain(self.startxref)
+        except RawPdfError:
+            self.close()
+            raise
+        except (IndexError, ValueError, KeyError, TypeError, AttributeError, zlib.error) as e:
+            self.close()
+            raise RawPdfError(f'damaged cross-reference data: {e}') from e
+
+    def close(self):
+        self._cache.clear()
+        self._objstms.clear()
+        self._flat_nodes.clear()
+        if not self.buf.closed:
+            self.buf.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -- cross-reference -------------------------------------------------
+
+    def _find_startxref(self):
+        tail_start = max(0, len(self.buf) - 2048)
+        at = self.buf.rfind(b'startxref', tail_start)
+        if at < 0:
+            raise RawPdfError('no startxref')
+        m = re.match(rb'startxref\s+(\d+)', self.buf[at:at + 40])
+        if not m:
+            raise RawPdfError('bad startxref')
+        return int(m.group(1))
+
+    def _load_xref_chain(self, offset):
+        seen = set()
+        first = True
+        while offset is not None:
+            if offset in seen or offset >= len(self.buf):
+                raise RawPdfError('bad xref offset')
+            seen.add(offset)
+            pos = _skip(self.buf, offset)
+            if self.buf[pos:pos + 4] == b'xref':
+                trailer = self._read_xref_table(pos + 4)
+                if '/XRefStm' in trailer:
+                    self._read_xref_stream(trailer['/XRefStm'])
+            else:
+                trailer = self._read_xref_stream(offset)
+                if first:
+                    self.xref_is_stream = True
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            first = False
+            offset = trailer.get('/Prev')
+
+    def _read_xref_table(self, pos):
+        """
+        Index a classic xref table without parsing its entries: each
+        subsection is recorded as (start, count, offset of first entry) and
+        entries are read on demand, 20 bytes apiece.
+        """
+        buf = self.buf
+        while True:
+            pos = _skip(buf, pos)
+            if buf[pos:pos + 7] == b'trailer':
+                trailer, _ = parse_object(buf, pos + 7)
+                return trailer
+            m = _XREF_SUBSECTION.match(buf, pos)
+            if not m:
+                raise RawPdfError('bad xref subsection')
+            start, count = int(m.group(1)), int(m.group(2))
+            pos = _skip(buf, m.end())
+            if count and not (_XREF_ENTRY.match(buf, pos)
+                              and _XREF_ENTRY.match(buf, pos + 20 * (count - 1))):
+                raise RawPdfError('xref entries are not 20 bytes long')
+            self._sections.append(('table', start, count, pos))
+            pos += 20 * count
+
+    def _read_xref_stream(self, offset):
+        _, _, stream = self._parse_indirect(offset)
+        if not isinstance(stream, Stream) or stream.dict.get('/Type') != '/XRef':
+            raise RawPdfError('startxref does not point at an xref')
+        data = self.decode(stream)
+        widths = stream.dict['/W']
+        index = stream.dict.get('/Index', [0, stream.dict['/Size']])
+        if len(data) < sum(widths) * sum(index[1::2]):
+            raise RawPdfError('truncated xref stream')
+        pos = 0
+        for i in range(0, len(index), 2):
+            start, count = index[i], index[i + 1]
+            self._sections.append(('stream', start, count, (data, pos, widths)))
+            pos += sum(widths) * count
+        return stream.dict
+
+    def _xref_entry(self, num):
+        """
+        Cross-reference entry for object num from the newest section that
+        lists it: ('offset', byte offset, gen), ('objstm', stream number,
+        index), ('free', 0, 0), or None if no section mentions it.
+        """
+        for kind, start, count, where in self._sections:
+            if not start <= num < start + count:
+                continue
+            if kind == 'table':
+                e = _XREF_ENTRY.match(self.buf, where + 20 * (num - start))
+                if not e:
+                    raise RawPdfError(f'bad xref entry for object {num}')
+                if e.group(3) == b'n':
+                    return 'offset', int(e.group(1)), int(e.group(2))
+                return 'free', 0, 0
+            data, pos, widths = where
+            pos += sum(widths) * (num - start)
+            fields = []
+            for w in widths:
+                fields.append(int.from_bytes(data[pos:pos + w], 'big') if w else None)
+                pos += w
+            kind = 1 if fields[0] is None else fields[0]
+            if kind == 1:
+                return 'offset', fields[1], fields[2] or 0
+            if kind == 2:
+                return 'objstm', fields[1], fields[2]
+            return 'free', 0, 0
+        return None
+
+    # -- objects ---------------------------------------------------------
+
+    def generation(self, num):
+        """Generation number of object num as currently stored (0 if unknown)."""
+        entry = self._xref_entry(num)
+        return entry[2] if entry is not None and entry[0] == 'offset' else 0
+
+    def _parse_indirect(self, offset):
+        """Parse 'N G obj ... endobj' at offset; returns (num, gen, value)."""
+        m = _OBJ_HEADER.match(self.buf, offset)
+        if not m:
+            raise RawPdfError(f'no object at offset {offset}')
+        value, pos = parse_object(self.buf, m.end())
+        if isinstance(value, dict):
+            pos = _skip(self.buf, pos)
+            if self.buf[pos:pos + 6] == b'stream':
+                pos += 6
+                if self.buf[pos:pos + 2] == b'\r\n':
+                    pos += 2
+                elif self.buf[pos:pos + 1] in (b'\n', b'\r'):
+                    pos += 1
+                length = self.resolve(value.get('/Length'))
+                if not isinstance(length, int) or pos + length > len(self.buf):
+                    raise RawPdfError('bad stream length')
+                value = Stream(value, self.buf[pos:pos + length])
+        return int(m.group(1)), int(m.group(2)), value
+
+    def resolve(self, value):
+        """Follow a Ref (possibly through several) to its object."""
+        while isinstance(value, Ref):
+            value = self.get(value.num)
+        return value
+
+    def get(self, num, cache=True):
+        """
+        Return object number num (None for free or missing objects). With
+        cache=False the object is not kept, for callers that visit each
+        object once and want memory to stay flat.
+        """
+        if num in self._cache:
+            return self._cache[num]
+        entry = self._xref_entry(num)
+        if entry is None or entry[0] == 'free':
+            value = None
+        elif entry[0] == 'offset':
+            found, _, value = self._parse_indirect(entry[1])
+            if found != num:
+                raise RawPdfError(f'xref entry for object {num} points at object {found}')
+        else:
+            value = self._from_objstm(entry[1], entry[2])
+        if cache:
+            self._cache[num] = value
+        return value
+
+    def _from_objstm(self, stm_num, index):
+        if stm_num not in self._objstms:
+            stream = self.get(stm_num)
+            if not isinstance(stream, Stream):
+                raise RawPdfError(f'object stream {stm_num} is missing')
+            data = self.decode(stream)
+            n, first = stream.dict['/N'], stream.dict['/First']
+            header = [int(v) for v in data[:first].split()[:2 * n]]
+            self._objstms[stm_num] = (data, first, header)
+        data, first, header = self._objstms[stm_num]
+        value, _ = parse_object(data, first + header[2 * index + 1])
+        return value
+
+    def decode(self, stream):
+        """Decoded data of a stream; only FlateDecode (and no filter) are supported."""
+        filters = self.resolve(stream.dict.get('/Filter'))
+        params = self.resolve(stream.dict.get('/DecodeParms'))
+        if isinstance(filters, list):
+            if len(filters) > 1:
+                raise RawPdfError('filter chains are not supported')
+            filters = filters[0] if filters else None
+            params = params[0] if isinstance(params, list) and params else params
+        data = bytes(stream.raw)
+        if filters is None:
+            return data
+        if filters not in ('/FlateDecode', '/Fl'):
+            raise RawPdfError(f'unsupported filter {filters}')
+        data = zlib.decompress(data)
+        if isinstance(params, dict):
+            data = _unpredict(data, {k: self.resolve(v) for k, v in params.items()})
+        return data
+
+    # -- page tree -------------------------------------------------------
+
+    def pages_root(self):
+        catalog = self.resolve(self.trailer.get('/Root'))
+        if not isinstance(catalog, dict):
+            raise RawPdfError('no document catalog')
+        pages = self.resolve(catalog.get('/Pages'))
+        if not isinstance(pages, dict):
+            raise RawPdfError('no page tree')
+        return pages
+
+    def page_count(self):
+        count = self.resolve(self.pages_root().get('/Count'))
+        if not isinstance(count, int) or count < 0:
+            raise RawPdfError('bad page count')
+        return count
+
+    def find_page(self, index):
+        """
+        Locate page index by descending the page tree using /Count.
+
+        Returns (page dictionary, inherited attributes) where inherited
+        holds /MediaBox, /CropBox, /Resources and /Rotate from ancestors.
+        """
+        page, _, ancestors = descend_page_tree(self.pages_root(), index, self.resolve,
+                                               self._flat_nodes)
+        inherited = {}
+        for node in ancestors:
+            for key in ('/MediaBox', '/CropBox', '/Resources', '/Rotate'):
+                if key in node:
+                    inherited[key] = node[key]
+        return page, inherited
+
+    def page_size(self, index):
+        """(width, height) of the page's inherited MediaBox, in points."""
+        page, inherited = self.find_page(index)
+        box = self.resolve(page.get('/MediaBox', inherited.get('/MediaBox')))
+        if not isinstance(box, list) or len(box) != 4:
+            raise RawPdfError('page has no MediaBox')
+        x0, y0, x1, y1 = (float(self.resolve(v)) for v in box)
+        return abs(x1 - x0), abs(y1 - y0)
+
+    def display_size(self, index):
+        """
+        (width, height) of the page as a viewer shows it: its crop box (or
+        media box) turned by /Rotate, as impose.display_matrix sees it.
+        """
+        page, inherited = self.find_page(index)
+        box = self.resolve(page.get('/CropBox', inherited.get('/CropBox')))
+        if box is None:
+            box = self.resolve(page.get('/MediaBox', inherited.get('/MediaBox')))
+        if not isinstance(box, list) or len(box) != 4:
+            raise RawPdfError('page has no MediaBox')
+        x0, y0, x1, y1 = (float(self.resolve(v)) for v in box)
+        rotate = self.resolve(page.get('/Rotate', inherited.get('/Rotate', 0)))
+        if not isinstance(rotate, int):
+            raise RawPdfError('bad /Rotate')
+        width, height = abs(x1 - x0), abs(y1 - y0)
+        return (height, width) if rotate % 180 == 90 else (width, height)
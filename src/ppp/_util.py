@@ -1,8 +1,13 @@
-"""Shared utilities for locating bundled data files."""
+"""Shared utilities for locating bundled data files and scratch space."""
 
 import os
+import shutil
+import tempfile
+from contextlib import contextmanager
 from importlib.resources import files
 
+TMPFS_DIR = '/dev/shm'
+
 
 def get_data_path(filename):
     """Resolve a bundled data file, checking cwd first for user overrides."""
@@ -14,3 +19,53 @@ def get_data_path(filename):
     if os.path.isfile(resource_path):
         return resource_path
     return None
+
+
+def make_scratch_dir(prefix='ppp-', tmpfs=False, parent=None):
+    """
+    Create a private scratch directory and return its path.
+
+    With tmpfs=True the directory goes on /dev/shm when it exists, so
+    intermediate files never touch the disk. The caller owns cleanup.
+    """
+    if parent is None and tmpfs and os.path.isdir(TMPFS_DIR) and os.access(TMPFS_DIR, os.W_OK):
+        parent = TMPFS_DIR
+    return tempfile.mkdtemp(prefix=prefix, dir=parent)
+
+
+@contextmanager
+def scratch_dir(prefix='ppp-', tmpfs=False, parent=None):
+    """Context manager around make_scratch_dir() that removes the directory afterwards."""
+    path = make_scratch_dir(prefix, tmpfs, parent)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@contextmanager
+def atomic_output(path):
+    """
+    Yield a temporary file name next to path; when the block finishes it
+    replaces path. If the block raises (or exits) path is left as it was,
+    so a half-written file never looks like a finished one.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp-', suffix='.part')
+    os.close(fd)
+    # Let the writer create it afresh, with the usual permissions
+    os.remove(tmp)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def cache_dir():
+    """Directory for PPP's caches: $PPP_CACHE_DIR, else $XDG_CACHE_HOME/ppp or ~/.cache/ppp."""
+    path = os.environ.get('PPP_CACHE_DIR')
+    if not path:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        path = os.path.join(base, 'ppp')
+    return path
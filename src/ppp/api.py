@@ -0,0 +1,366 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+Python API.
+The workflow's stages as plain function calls, run in the calling process:
+nothing is printed, nothing is asked and nothing exits. Each function
+returns a result tuple and raises PPPError (or one of its subclasses)
+when it fails; the longer ones call progress(Progress(...)) as they go.
+
+    import ppp
+    plan = ppp.plan('book.pdf')[0]
+    signatures = ppp.split_signatures('book.pdf', plan.sig_sizes, 'out')
+    ppp.impose_signatures([s.path for s in signatures], 'out')
+
+These functions and the names ppp re-exports are the stable interface;
+the rest of the package may change between releases. Results are cached
+as for the command-line tools, and the cache is kept to its size limit
+(see ppp.cache; cache.configure(enabled=False) turns it off).
+"""
+
+import functools
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from ppp import cache, pageplan, trace
+from ppp._rawpdf import RawPdfError
+from ppp._util import atomic_output
+from ppp.impose import (
+    LETTER,
+    NUP_GRIDS,
+    SCHEMES,
+    SHEET_SIZES,
+    flip_edge,
+    impose_nup,
+    section_pages,
+)
+from ppp.incremental import append_blank_pages
+from ppp.planner import plan_signatures
+from ppp.probe import ProbeError, probe
+from ppp.split import signature_ranges, split_pdf
+from ppp.streammerge import stream_merge
+
+
+class PPPError(Exception):
+    """Something the API was asked to do could not be done."""
+
+
+class InputError(PPPError):
+    """An input file is missing, encrypted or not a readable PDF."""
+
+
+class PlanError(PPPError, ValueError):
+    """The requested signatures or imposition do not fit the input."""
+
+
+class ImposeError(PPPError):
+    """
+    Some signatures of a batch failed to impose.
+
+    failures lists (source, message) for each of them; results holds the
+    ImposeResult of every signature that succeeded.
+    """
+
+    def __init__(self, failures, results):
+        self.failures = failures
+        self.results = results
+        names = ', '.join(os.path.basename(source) for source, _ in failures)
+        super().__init__(f'{len(failures)} signature(s) failed to impose: {names}')
+
+
+Progress = namedtuple('Progress', ['stage', 'done', 'total', 'path'])
+Progress.__doc__ = """\
+Passed to progress callbacks after each file a stage finishes.
+
+stage names the stage ('split', 'impose' or 'merge'), done counts the
+files finished so far out of total, and path is the file just written
+(or, for merge, the input just copied).
+"""
+
+PadResult = namedtuple('PadResult', ['output', 'page_count', 'pages_added'])
+PadResult.__doc__ = """\
+The padded file, its page count and how many blank pages were added.
+output is the source itself if no padding was needed.
+"""
+
+Signature = namedtuple('Signature', ['path', 'pages'])
+Signature.__doc__ = """\
+One signature file written by split_signatures(), and its page count.
+"""
+
+ImposeResult = namedtuple('ImposeResult', ['source', 'output', 'pages', 'sides', 'flip_edge',
+                                           'cached'])
+ImposeResult.__doc__ = """\
+One imposed signature.
+
+pages is the page count of source, sides the number of sheet sides
+written to output (two per sheet) and flip_edge which edge ('long' or
+'short') to flip on when printing them double-sided. cached is True if
+output was copied from the cache rather than imposed.
+"""
+
+MergeResult = namedtuple('MergeResult', ['output', 'pages', 'inputs'])
+MergeResult.__doc__ = """\
+The merged file, its page count and the number of files merged into it.
+"""
+
+
+def _info(path):
+    """probe(path), raising InputError for files that cannot be used."""
+    if not os.path.isfile(path):
+        raise InputError(f'{path}: no such file')
+    try:
+        info = probe(path)
+    except ProbeError as e:
+        raise InputError(f'{path}: not a readable PDF ({e})') from e
+    if info.encrypted:
+        raise InputError(f'{path}: encrypted')
+    return info
+
+
+def page_count(source):
+    """Number of pages in source."""
+    return _info(source).page_count
+
+
+def plan(source, limit=5, **options):
+    """
+    Ways to cut source (a PDF, or a page count) into signatures, best
+    first, as planner.Plan tuples. options are passed on to
+    planner.plan_signatures. Raises PlanError if there are none.
+    """
+    count = source if isinstance(source, int) else page_count(source)
+    plans = plan_signatures(count, limit=limit, **options)
+    if not plans:
+        raise PlanError(f'no signature plan fits {count} pages')
+    return plans
+
+
+def pad_pdf(source, output=None, multiple=4, incremental=False):
+    """
+    Add blank pages, the size of the last one, until source's page count
+    is a multiple of multiple.
+
+    output defaults to padded-<name> beside source. With incremental set
+    the pages are appended as an incremental update instead of rewriting
+    the document (see ppp.incremental); output may then be source itself.
+    """
+    if multiple < 1:
+        raise ValueError('multiple must be at least 1')
+    count = page_count(source)
+    pages_to_add = -count % multiple
+    if not pages_to_add:
+        return PadResult(source, count, 0)
+
+    if output is None:
+        directory, name = os.path.split(source)
+        output = os.path.join(directory, f'padded-{name}')
+    in_place = os.path.isfile(output) and os.path.samefile(source, output)
+    if in_place and not incremental:
+        raise ValueError('padding in place needs incremental=True')
+
+    try:
+        if incremental:
+            append_blank_pages(source, pages_to_add, None if in_place else output)
+        else:
+            pages = pageplan.source_pages(source)
+            size = pageplan.last_page_size(source)
+            pageplan.write_pdf(pageplan.pad(pages, pages_to_add, size), output)
+    except RawPdfError as e:
+        raise InputError(f'{source}: cannot append to it ({e})') from e
+    except OSError as e:
+        raise PPPError(f'{output}: {e}') from e
+    return PadResult(output, count + pages_to_add, pages_to_add)
+
+
+def split_signatures(source, sig_sizes, output_dir='.', progress=None):
+    """
+    Split source into signature files sig01.pdf, sig02.pdf, ... in
+    output_dir. sig_sizes is a list of sizes, or one size for signatures
+    all alike; they must add up to source's page count.
+
+    Returns a list of Signature, in order.
+    """
+    count = page_count(source)
+    if isinstance(sig_sizes, int):
+        if sig_sizes < 1 or count % sig_sizes:
+            raise PlanError(f'{count} pages do not divide into {sig_sizes}-page signatures')
+        sig_sizes = [sig_sizes] * (count // sig_sizes)
+    if sum(sig_sizes) != count:
+        raise PlanError(f'signature sizes add up to {sum(sig_sizes)} pages, '
+                        f'but {source} has {count}')
+
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = [os.path.join(output_dir, f'sig{str(i).zfill(2)}.pdf')
+               for i in range(1, len(sig_sizes) + 1)]
+    signatures = []
+
+    def report(output_file, pages):
+        signatures.append(Signature(output_file, pages))
+        if progress is not None:
+            progress(Progress('split', len(signatures), len(outputs), output_file))
+
+    with trace.span('split', inputs=[source], outputs=outputs, signatures=len(sig_sizes)):
+        try:
+            split_pdf(source, signature_ranges(sig_sizes), outputs, progress=report)
+        except OSError as e:
+            raise PPPError(f'could not split {source}: {e}') from e
+        except Exception as e:
+            raise InputError(f'could not split {source}: {e}') from e
+    return signatures
+
+
+def _sheet(sheet_size):
+    """A sheet size given as (width, height) in points or by name."""
+    if isinstance(sheet_size, str):
+        try:
+            return SHEET_SIZES[sheet_size.lower()]
+        except KeyError:
+            raise PlanError(f'unknown sheet size {sheet_size!r}; choose from '
+                            f'{", ".join(SHEET_SIZES)}') from None
+    return tuple(sheet_size)
+
+
+def _impose(source, output, nup=2, scheme='sheetwise', sheet_size=LETTER, nested=True):
+    """impose_pdf() without trimming the cache afterwards."""
+    if nup not in NUP_GRIDS or nup < 2:
+        raise PlanError(f'cannot impose {nup}-up; choose 2, 4, 8 or 16')
+    if scheme not in SCHEMES:
+        raise PlanError(f'unknown imposition scheme {scheme!r}; choose from {", ".join(SCHEMES)}')
+    sheet_size = _sheet(sheet_size)
+    info = _info(source)
+    edge = flip_edge(nup, scheme, sheet_size, info.page_sizes.get(0))
+
+    params = {'nup': nup, 'scheme': scheme, 'sheet': sheet_size, 'nested': nested}
+    key = cache.make_key('impose', [source], params) if cache.enabled() else None
+    with trace.span('impose-nup', inputs=[source], outputs=[output], **params) as span:
+        try:
+            with atomic_output(output) as part:
+                cached = cache.fetch(key, part)
+                if cached:
+                    sides = 2 * -(-info.page_count // section_pages(nup, scheme))
+                else:
+                    sides = impose_nup(source, part, nup, scheme, sheet_size, nested)
+        except OSError as e:
+            raise PPPError(f'could not write {output}: {e}') from e
+        except Exception as e:
+            raise InputError(f'could not impose {source}: {e}') from e
+        span['args']['cached'] = cached
+    if not cached:
+        cache.store(key, output)
+    return ImposeResult(source, output, info.page_count, sides, edge, cached)
+
+
+def impose_pdf(source, output, nup=2, scheme='sheetwise', sheet_size=LETTER, nested=True):
+    """
+    Impose the signature source nup-up onto sheets of sheet_size (a size
+    in points or a name from impose.SHEET_SIZES), writing output.
+
+    nup is 2, 4, 8 or 16 and scheme 'sheetwise' or 'work-and-turn'. With
+    nested set the sheets are inset into one section, as for a 2-up
+    booklet; otherwise each sheet folds into a section of its own. See
+    impose.nup_order. output only appears once it is complete, whether
+    imposed or copied from the cache; the cache is trimmed back to size
+    afterwards.
+    """
+    result = _impose(source, output, nup, scheme, sheet_size, nested)
+    if not result.cached:
+        cache.evict()
+    return result
+
+
+def _imposed_name(source):
+    """Output name for a signature: sig01.pdf -> 01.pdf, anything else -> PPP<name>."""
+    name = os.path.basename(source)
+    if name.startswith('sig') and name[3:-4].isdigit() and name.endswith('.pdf'):
+        return name[3:]
+    return f'PPP{name}'
+
+
+def _impose_task(job, options):
+    """Impose one (source, output) pair; returns (result or None, error or None)."""
+    source, output = job
+    try:
+        return _impose(source, output, **options), None
+    except PPPError as e:
+        return None, str(e)
+
+
+def impose_signatures(sources, output_dir, workers=None, progress=None, **options):
+    """
+    Impose a batch of signature files into output_dir: sig01.pdf becomes
+    01.pdf and any other name gets a PPP prefix. options are those of
+    impose_pdf().
+
+    Signatures are independent, so with workers above 1 (default: one per
+    CPU core) they are imposed by a pool of that many processes; with
+    workers=1 everything happens in the calling process. Every signature
+    is attempted, in order, and the cache is trimmed back to size once at
+    the end. Returns a list of ImposeResult, or raises ImposeError listing
+    the signatures that failed.
+    """
+    sources = list(sources)
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(source, os.path.join(output_dir, _imposed_name(source))) for source in sources]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+
+    task = functools.partial(_impose_task, options=options)
+    results, failures = [], []
+
+    def collect(outcomes):
+        for done, ((source, output), (result, error)) in enumerate(zip(jobs, outcomes), 1):
+            if error is None:
+                results.append(result)
+            else:
+                failures.append((source, error))
+            if progress is not None:
+                progress(Progress('impose', done, len(jobs), output))
+
+    # Imposition is CPU-bound Python, so a process pool rather than threads
+    if workers == 1:
+        collect(map(task, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            collect(pool.map(task, jobs))
+    if any(not result.cached for result in results):
+        cache.evict()
+
+    if failures:
+        raise ImposeError(failures, results)
+    return results
+
+
+def merge_pdfs(inputs, output, delete=False, progress=None):
+    """
+    Concatenate the pages of inputs into output, one input at a time so
+    memory stays bounded however many there are (see ppp.streammerge).
+    With delete set the inputs are removed afterwards.
+    """
+    inputs = list(inputs)
+    for path in inputs:
+        _info(path)
+
+    done = []
+
+    def report(path, pages):
+        done.append(path)
+        if progress is not None:
+            progress(Progress('merge', len(done), len(inputs), path))
+
+    with trace.span('merge', inputs=inputs, outputs=[output]):
+        try:
+            pages = stream_merge(inputs, output, delete=delete, progress=report)
+        except OSError as e:
+            raise PPPError(f'could not write {output}: {e}') from e
+        except Exception as e:
+            raise InputError(f'could not merge into {output}: {e}') from e
+    return MergeResult(output, pages, len(inputs))
@@ -0,0 +1,203 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+Content-addressed cache for stage outputs.
+Each result is stored under a key hashed from the input files' contents,
+the stage parameters and the versions of the tools that produced it, so
+re-running a book with an unchanged stage is a file copy. The cache lives
+in <cache dir>/objects and is trimmed least-recently-used first to stay
+under a size limit (PPP_CACHE_SIZE, default 2G). Set PPP_CACHE=0 to turn
+it off.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from importlib import metadata
+
+import PyPDF2
+
+from ppp._util import cache_dir
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+_settings = {'enabled': os.environ.get('PPP_CACHE', '') != '0', 'max_bytes': None}
+_digests = {}
+_versions = {}
+
+
+def parse_size(text):
+    """Parse a size like '500M' or '2G' into bytes."""
+    text = str(text).strip().upper().removesuffix('B').removesuffix('I')
+    unit = text[-1:] if text[-1:] in _UNITS else ''
+    try:
+        value = float(text[:len(text) - len(unit)])
+    except ValueError:
+        raise ValueError(f'invalid size: {text!r}')
+    if value < 0:
+        raise ValueError(f'invalid size: {text!r}')
+    return int(value * _UNITS[unit])
+
+
+def configure(enabled=None, max_bytes=None):
+    """Turn the cache on or off and set its size limit in bytes."""
+    if enabled is not None:
+        _settings['enabled'] = enabled
+    if max_bytes is not None:
+        _settings['max_bytes'] = max_bytes
+
+
+def enabled():
+    return _settings['enabled']
+
+
+def max_bytes():
+    if _settings['max_bytes'] is not None:
+        return _settings['max_bytes']
+    try:
+        return parse_size(os.environ['PPP_CACHE_SIZE'])
+    except (KeyError, ValueError):
+        return DEFAULT_MAX_BYTES
+
+
+def objects_dir():
+    return os.path.join(cache_dir(), 'objects')
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, memoized by (realpath, size, mtime, inode)."""
+    st = os.stat(path)
+    key = (os.path.realpath(path), st.st_size, st.st_mtime_ns, st.st_ino)
+    digest = _digests.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        digest = _digests[key] = h.hexdigest()
+    return digest
+
+
+def _code_digest():
+    """Hash of the modules that render PDFs, so code changes miss the cache."""
+    h = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in ('impose.py', 'pageplan.py'):
+        with open(os.path.join(here, name), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def tool_versions(*tools):
+    """
+    Versions that a cached result depends on: ppp, PyPDF2 and the rendering
+    code, plus any external tools named (e.g. 'gs').
+    """
+    if 'ppp' not in _versions:
+        try:
+            _versions['ppp'] = metadata.version('ppp-prepress')
+        except metadata.PackageNotFoundError:
+            _versions['ppp'] = 'dev'
+        _versions['PyPDF2'] = PyPDF2.__version__
+        _versions['code'] = _code_digest()
+    for tool in tools:
+        if tool not in _versions:
+            try:
+                result = subprocess.run([tool, '--version'], capture_output=True, text=True)
+                _versions[tool] = result.stdout.strip()
+            except OSError:
+                _versions[tool] = None
+    return {name: _versions[name] for name in ('ppp', 'PyPDF2', 'code', *tools)}
+
+
+def make_key(stage, inputs, params, tools=()):
+    """
+    Cache key for a stage run.
+
+    inputs are file paths (hashed by content, not name), params any
+    JSON-serializable stage parameters, tools extra external tools whose
+    version matters.
+    """
+    blob = json.dumps({
+        'stage': stage,
+        'inputs': [file_digest(path) for path in inputs],
+        'params': params,
+        'versions': tool_versions(*tools),
+    }, sort_keys=True)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def _object_path(key):
+    return os.path.join(objects_dir(), key[:2], key[2:])
+
+
+def fetch(key, dest):
+    """
+    Copy the cached result for key to dest. Returns True on a hit.
+    A hit counts as a use for LRU eviction. A key of None never hits.
+    """
+    if key is None:
+        return False
+    path = _object_path(key)
+    try:
+        shutil.copyfile(path, dest)
+        os.utime(path)
+    except OSError:
+        return False
+    return True
+
+
+def store(key, src):
+    """
+    Add src to the cache under key (None: do nothing). Call evict() once
+    the run is done to trim the cache back to size.
+    """
+    if key is None:
+        return
+    path = _object_path(key)
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        os.close(fd)
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, path)
+    except OSError:
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def evict(limit=None):
+    """Delete least recently used entries until the cache fits in limit bytes."""
+    if limit is None:
+        limit = max_bytes()
+    entries = []
+    total = 0
+    for root, _, names in os.walk(objects_dir()):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
@@ -0,0 +1,462 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+Native imposition engine.
+Places signature pages onto printer sheets in-process, replacing the
+pdftops -> psbook -> pstops -> ps2pdf PostScript round trip. Each source
+page is wrapped in a Form XObject, so content streams, fonts and images
+are copied through untouched instead of being re-encoded by ghostscript.
+
+Page order comes from folding: a sheet with a grid of pages on each side
+is folded in half, across alternate directions, until one leaf is left,
+and the pages are numbered as the folded section reads. That gives 2-,
+4-, 8- and 16-up layouts for any signature size, printed sheetwise or
+work-and-turn, from the same few lines.
+"""
+
+from collections import namedtuple
+
+import PyPDF2
+from PyPDF2.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    EncodedStreamObject,
+    FloatObject,
+    NameObject,
+)
+
+LETTER = (612, 792)  # 8.5 x 11 in, in points
+HALF_LETTER = (396, 612)  # 5.5 x 8.5 in
+
+SHEET_SIZES = {
+    'letter': LETTER,
+    'legal': (612, 1008),
+    'tabloid': (792, 1224),
+    'a4': (595, 842),
+    'a3': (842, 1191),
+}
+
+IDENTITY = (1, 0, 0, 1, 0, 0)
+
+# Pages across and up each side of a sheet (a 1-up "sheet" is a single leaf)
+NUP_GRIDS = {1: (1, 1), 2: (2, 1), 4: (2, 2), 8: (4, 2), 16: (4, 4)}
+
+# sheetwise: front and back printed from different layouts, one section
+# per sheet. work-and-turn: both halves of a section side by side, the
+# same layout printed on both sides, so each sheet cuts into two copies.
+SCHEMES = ('sheetwise', 'work-and-turn')
+
+Cell = namedtuple('Cell', ['matrix', 'width', 'height'])
+Cell.__doc__ = """\
+One page position on a sheet: matrix maps a width x height box onto the
+sheet, upright or upside down as the fold requires. Pages are shrunk to
+fit the box if need be and centred in it (see cell_matrix).
+"""
+
+
+def multiply(m, n):
+    """Compose two PDF matrices: apply m first, then n."""
+    a, b, c, d, e, f = m
+    A, B, C, D, E, F = n
+    return (
+        a * A + b * C,
+        a * B + b * D,
+        c * A + d * C,
+        c * B + d * D,
+        e * A + f * C + E,
+        e * B + f * D + F,
+    )
+
+
+def rotation_matrix(quarter_turns):
+    """Counter-clockwise rotation by a multiple of 90 degrees about the origin."""
+    return [
+        (1, 0, 0, 1, 0, 0),
+        (0, 1, -1, 0, 0, 0),
+        (-1, 0, 0, -1, 0, 0),
+        (0, -1, 1, 0, 0, 0),
+    ][quarter_turns % 4]
+
+
+def _fmt(value):
+    """Format a number for a content stream without float noise."""
+    text = f'{value:.4f}'.rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+
+def page_box(page):
+    """Visible (crop) box of a page as floats: (x0, y0, x1, y1)."""
+    box = page.cropbox
+    x0, y0 = float(box.left), float(box.bottom)
+    x1, y1 = float(box.right), float(box.top)
+    return min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)
+
+
+def display_matrix(page):
+    """
+    Matrix mapping a page's user space to its upright, displayed space.
+
+    Honours the crop box origin and /Rotate, the same way a viewer (or
+    pdftops) would present the page. Returns (matrix, width, height) where
+    width and height are the displayed dimensions.
+    """
+    x0, y0, x1, y1 = page_box(page)
+    w, h = x1 - x0, y1 - y0
+    rotate = int(page.get('/Rotate', 0) or 0) % 360
+    if rotate == 90:
+        return (0, -1, 1, 0, -y0, x1), h, w
+    if rotate == 180:
+        return (-1, 0, 0, -1, x1, y1), w, h
+    if rotate == 270:
+        return (0, 1, -1, 0, y1, -x0), h, w
+    return (1, 0, 0, 1, -x0, -y0), w, h
+
+
+def page_xobject(writer, page):
+    """
+    Wrap a source page in a Form XObject owned by writer.
+
+    A single content stream is copied byte-for-byte with its filters; only
+    pages with an array of content streams are decoded and re-flated.
+    Returns an indirect reference to the new XObject.
+    """
+    contents = page.get('/Contents')
+    contents = contents.get_object() if contents is not None else None
+
+    if isinstance(contents, ArrayObject):
+        data = b'\n'.join(s.get_object().get_data() for s in contents)
+        plain = DecodedStreamObject()
+        plain.set_data(data)
+        form = plain.flate_encode()
+    elif contents is not None and '/Filter' in contents:
+        form = EncodedStreamObject()
+        form._data = contents._data
+        form[NameObject('/Filter')] = contents['/Filter'].clone(writer)
+        if '/DecodeParms' in contents:
+            form[NameObject('/DecodeParms')] = contents['/DecodeParms'].clone(writer)
+    else:
+        form = DecodedStreamObject()
+        form.set_data(contents._data if contents is not None else b'')
+
+    form[NameObject('/Type')] = NameObject('/XObject')
+    form[NameObject('/Subtype')] = NameObject('/Form')
+    form[NameObject('/BBox')] = ArrayObject(FloatObject(v) for v in page_box(page))
+    resources = page.raw_get('/Resources') if '/Resources' in page else None
+    form[NameObject('/Resources')] = (
+        resources.clone(writer) if resources is not None else DictionaryObject()
+    )
+    if '/Group' in page:
+        form[NameObject('/Group')] = page.raw_get('/Group').clone(writer)
+
+    return writer._add_object(form)
+
+
+def add_sheet(writer, sheet_size, placements):
+    """
+    Append one output page to writer.
+
+    placements is a list of (xobject_ref, matrix) pairs; each XObject is
+    drawn with its matrix in its own graphics state.
+    """
+    width, height = sheet_size
+    xobjects = DictionaryObject()
+    ops = []
+    for i, (xobject, matrix) in enumerate(placements):
+        name = NameObject(f'/P{i}')
+        xobjects[name] = xobject
+        ops.append(f'q {" ".join(_fmt(v) for v in matrix)} cm {name} Do Q')
+
+    content = DecodedStreamObject()
+    content.set_data('\n'.join(ops).encode('latin-1'))
+
+    sheet = PyPDF2.PageObject.create_blank_page(None, width, height)
+    sheet[NameObject('/Resources')] = DictionaryObject(
+        {NameObject('/XObject'): xobjects}
+    )
+    sheet[NameObject('/Contents')] = writer._add_object(content.flate_encode())
+    writer.add_page(sheet)
+
+
+def _folds(columns, rows):
+    """
+    Fold sequence ('v' or 'h') taking a columns x rows grid down to one
+    cell. Folds alternate direction, and the last one is always vertical:
+    it becomes the spine.
+    """
+    folds = []
+    axis = 'v'
+    while columns > 1 or rows > 1:
+        if axis == 'v' and columns > 1:
+            columns //= 2
+            folds.append('v')
+        elif axis == 'h' and rows > 1:
+            rows //= 2
+            folds.append('h')
+        axis = 'h' if axis == 'v' else 'v'
+    return folds[::-1]
+
+
+def fold_section(columns, rows):
+    """
+    Fold a sheet printed with a columns x rows grid of pages on each side
+    and read off the section it makes.
+
+    Vertical folds take the left half over the right, horizontal ones the
+    bottom half under the top, which is the layout psbook and the old
+    pstops specs produce for 2-up and 4-up. Columns and rows count from
+    the bottom left of each side as it is printed; the back is printed
+    turned over about the vertical axis.
+
+    Returns a list with one entry per page of the section, in reading
+    order: (side, column, row, upside_down), side 0 being the side that
+    carries the first page.
+    """
+    cells = {(x, y): {'x': x, 'y': y, 'layer': 0, 'face': 0, 'flip': [0, 0]}
+             for x in range(columns) for y in range(rows)}
+    width, height, layers = columns, rows, 1
+    for fold in _folds(columns, rows):
+        axis = 0 if fold == 'v' else 1
+        key = 'xy'[axis]
+        span = width if fold == 'v' else height
+        for cell in cells.values():
+            moving = cell[key] < span // 2
+            # Both halves end up in the former upper half
+            cell[key] = (span - 1 - cell[key] if moving else cell[key]) - span // 2
+            if moving:
+                cell['layer'] = layers - 1 - cell['layer'] + (layers if fold == 'h' else 0)
+                cell['face'] ^= 1
+                cell['flip'][axis] ^= 1
+            elif fold == 'v':
+                cell['layer'] += layers
+        if fold == 'v':
+            width //= 2
+        else:
+            height //= 2
+        layers *= 2
+
+    section = [None] * (2 * layers)
+    for (x, y), cell in cells.items():
+        for down in (0, 1):
+            # The top face of each leaf is read first, then (turning the
+            # leaf about the spine) the bottom one
+            face = cell['face'] ^ down
+            upside_down = bool(cell['flip'][1])
+            column = x if face == 0 else columns - 1 - x
+            section[2 * cell['layer'] + down] = (face, column, y, upside_down)
+    if section[0][0] == 1:
+        section = [(1 - side, column, row, flip) for side, column, row, flip in section]
+    return section
+
+
+def _grids(nup, scheme):
+    """(section grid, side grid) for nup pages per side under scheme."""
+    if nup not in NUP_GRIDS or nup < 2:
+        raise ValueError(f'cannot impose {nup}-up; choose 2, 4, 8 or 16')
+    if scheme not in SCHEMES:
+        raise ValueError(f'unknown imposition scheme {scheme!r}')
+    if scheme == 'sheetwise':
+        return NUP_GRIDS[nup], NUP_GRIDS[nup]
+    columns, rows = NUP_GRIDS[nup // 2]
+    return (columns, rows), (2 * columns, rows)
+
+
+def section_pages(nup, scheme='sheetwise'):
+    """Pages in the section one sheet folds into."""
+    (columns, rows), _ = _grids(nup, scheme)
+    return 2 * columns * rows
+
+
+def nup_order(page_count, nup=2, scheme='sheetwise', nested=True):
+    """
+    Which page goes where on every sheet side of a signature.
+
+    The signature is rounded up to whole sections. With nested set the
+    sections are inset one inside the next and folded together, the
+    outermost sheet holding the first and last pages (as psbook orders a
+    2-up booklet); otherwise each sheet is a section of its own, in page
+    order, to be gathered one after another.
+
+    Returns a list of sides, two per sheet, each a list of
+    (page index or None, column, row, upside_down) on the side's grid;
+    None marks a blank page. Under work-and-turn both sides of a sheet
+    are the same.
+
+    A section of only two pages (2-up work-and-turn) is a single unfolded
+    leaf, which cannot be inset into another, so those are always stacked.
+    """
+    (columns, rows), _ = _grids(nup, scheme)
+    layout = fold_section(columns, rows)
+    per_section = len(layout)
+    if per_section == 2:
+        nested = False
+    half = per_section // 2
+    total = page_count + (-page_count % per_section)
+
+    sides = []
+    for sheet in range(total // per_section):
+        placed = ([], [])
+        for local, (side, column, row, upside_down) in enumerate(layout):
+            if not nested:
+                index = sheet * per_section + local
+            elif local < half:
+                index = sheet * half + local
+            else:
+                index = total - (sheet + 1) * half + local - half
+            index = index if index < page_count else None
+            if scheme == 'sheetwise':
+                placed[side].append((index, column, row, upside_down))
+            else:
+                # The back half sits beside the front, so turning the sheet
+                # over puts it behind the front of the other copy
+                column += columns * side
+                placed[0].append((index, column, row, upside_down))
+                placed[1].append((index, column, row, upside_down))
+        sides.extend(placed)
+    return sides
+
+
+def _orientation(nup, scheme, sheet_size, page_size):
+    """
+    Lay the side grid across the sheet or turned a quarter turn, whichever
+    fits page_size larger. Returns (rotated, cell width, cell height).
+    """
+    _, (columns, rows) = _grids(nup, scheme)
+    sheet_w, sheet_h = sheet_size
+    page_w, page_h = page_size or HALF_LETTER
+    best = None
+    for rotated, (layout_w, layout_h) in ((False, (sheet_w, sheet_h)), (True, (sheet_h, sheet_w))):
+        cell_w, cell_h = layout_w / columns, layout_h / rows
+        scale = min(cell_w / page_w, cell_h / page_h)
+        if best is None or scale > best[0]:
+            best = (scale, rotated, cell_w, cell_h)
+    return best[1:]
+
+
+def nup_cells(nup, scheme='sheetwise', sheet_size=LETTER, page_size=None):
+    """
+    Cell for every (column, row, upside_down) position of a side grid.
+
+    page_size is the typical page (default: half letter); it only decides
+    which way round the grid goes on the sheet. Turned a quarter turn, the
+    grid's bottom row runs up the right-hand edge of the sheet, as in
+    `pstops '2:0L@1.0(1w,0)+1L@1.0(1w,0.5h)'`.
+    """
+    _, (columns, rows) = _grids(nup, scheme)
+    rotated, cell_w, cell_h = _orientation(nup, scheme, sheet_size, page_size)
+    base = multiply(rotation_matrix(1), (1, 0, 0, 1, sheet_size[0], 0)) if rotated else IDENTITY
+    cells = {}
+    for column in range(columns):
+        for row in range(rows):
+            x, y = column * cell_w, row * cell_h
+            cells[column, row, False] = Cell(multiply((1, 0, 0, 1, x, y), base), cell_w, cell_h)
+            cells[column, row, True] = Cell(
+                multiply((-1, 0, 0, -1, x + cell_w, y + cell_h), base), cell_w, cell_h)
+    return cells
+
+
+def flip_edge(nup, scheme='sheetwise', sheet_size=LETTER, page_size=None):
+    """Which edge ('long' or 'short') to flip on when printing the sheets double-sided."""
+    rotated, _, _ = _orientation(nup, scheme, sheet_size, page_size)
+    sheet_w, sheet_h = sheet_size
+    # Sides are turned about the grid's vertical axis
+    vertical_is_long = sheet_h >= sheet_w
+    return 'long' if vertical_is_long != rotated else 'short'
+
+
+def cell_matrix(cell, width, height):
+    """Matrix putting a width x height page into cell: shrunk to fit if too big, centred."""
+    scale = min(1, cell.width / width, cell.height / height)
+    fit = (scale, 0, 0, scale, (cell.width - width * scale) / 2, (cell.height - height * scale) / 2)
+    return multiply(fit, cell.matrix)
+
+
+def impose_nup(source_file, output_file, nup=2, scheme='sheetwise', sheet_size=LETTER,
+               nested=True):
+    """
+    Impose a signature nup-up in one pass; see nup_order for the page
+    order and nup_cells for the placement.
+
+    Returns the number of sheet sides written.
+    """
+    with open(source_file, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        writer = PyPDF2.PdfWriter()
+        xobjects = {}
+
+        page_count = len(reader.pages)
+        page_size = display_matrix(reader.pages[0])[1:] if page_count else None
+        cells = nup_cells(nup, scheme, sheet_size, page_size)
+        sides = nup_order(page_count, nup, scheme, nested)
+        for side in sides:
+            placements = []
+            for index, column, row, upside_down in side:
+                if index is None:
+                    continue
+                page = reader.pages[index]
+                if index not in xobjects:
+                    xobjects[index] = page_xobject(writer, page)
+                matrix, width, height = display_matrix(page)
+                cell = cell_matrix(cells[column, row, upside_down], width, height)
+                placements.append((xobjects[index], multiply(matrix, cell)))
+            add_sheet(writer, sheet_size, placements)
+
+        with open(output_file, 'wb') as out:
+            writer.write(out)
+
+    return len(sides)
+
+
+def impose_2up(source_file, output_file, sheet_size=LETTER):
+    """
+    Impose a signature 2-up in booklet order onto letter sheets.
+
+    Uses the page order and rotation of the old `psbook` + `pstops
+    '2:0L@1.0(1w,0)+1L@1.0(1w,0.5h)'` pipeline: each page is rotated a
+    quarter turn counter-clockwise, the first of each pair on the bottom
+    half of the sheet and the second on the top half. Unlike pstops, a
+    page smaller than its half of the sheet is centred in it, and one
+    too big is shrunk to fit (see cell_matrix); half-letter pages come
+    out the same as before.
+
+    Returns the number of sheet sides written.
+    """
+    return impose_nup(source_file, output_file, 2, 'sheetwise', sheet_size)
+
+
+def check_leaves():
+    """
+    Check nup_order for every layout: each leaf, once the sheets are cut
+    and folded, must carry consecutive pages front and back (1 and 2, 3
+    and 4, ...). Raises AssertionError naming the first layout that does
+    not. Run it with `python -m ppp.impose`.
+    """
+    for nup in sorted(NUP_GRIDS):
+        if nup < 2:
+            continue
+        for scheme in SCHEMES:
+            columns = _grids(nup, scheme)[1][0]
+            per_section = section_pages(nup, scheme)
+            for nested in (True, False):
+                for page_count in (per_section, 3 * per_section):
+                    sides = nup_order(page_count, nup, scheme, nested)
+                    for front, back in zip(sides[::2], sides[1::2]):
+                        # The back is printed turned over about the vertical axis
+                        behind = {(column, row): index for index, column, row, _ in back}
+                        for index, column, row, _ in front:
+                            first, second = sorted((index, behind[columns - 1 - column, row]))
+                            assert first % 2 == 0 and second == first + 1, (
+                                f'{nup}-up {scheme}, {"nested" if nested else "stacked"}, '
+                                f'{page_count} pages: pages {first + 1} and {second + 1} '
+                                f'share a leaf')
+
+
+if __name__ == '__main__':
+    check_leaves()
+    print('All leaves carry consecutive pages.')
@@ -0,0 +1,155 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+Blank-page padding by PDF incremental update.
+Instead of rewriting the document, the new pages, the updated root of the
+page tree and a new cross-reference section are appended to the end of
+the file, the way a PDF editor saves changes. Only the trailer, the page
+tree root and the last page are read, so padding a 500 MB scan costs a
+few kilobytes of I/O.
+"""
+
+import os
+import shutil
+
+from ppp._rawpdf import Name, RawPdf, RawPdfError, Ref, serialize
+
+
+def _updated_pages(pdf, count, first_num):
+    """
+    The objects to write for count blank pages numbered from first_num:
+    a list of (number, generation, value).
+    """
+    catalog = pdf.resolve(pdf.trailer.get('/Root'))
+    pages_ref = catalog.get('/Pages') if isinstance(catalog, dict) else None
+    if not isinstance(pages_ref, Ref):
+        raise RawPdfError('page tree root is not an indirect object')
+    root = dict(pdf.resolve(pages_ref))
+    page_count = pdf.page_count()
+    if page_count == 0:
+        raise RawPdfError('document has no pages to match')
+
+    # Blank pages copy the last page's MediaBox and rotation
+    last, inherited = pdf.find_page(page_count - 1)
+    box = pdf.resolve(last.get('/MediaBox', inherited.get('/MediaBox')))
+    if not isinstance(box, list) or len(box) != 4:
+        raise RawPdfError('last page has no MediaBox')
+    rotate = pdf.resolve(last.get('/Rotate', inherited.get('/Rotate', 0)))
+
+    box_num, resources_num = first_num, first_num + 1
+    page_refs = [Ref(first_num + 2 + i, 0) for i in range(count)]
+    page = {
+        Name('/Type'): Name('/Page'),
+        Name('/Parent'): pages_ref,
+        Name('/MediaBox'): Ref(box_num, 0),
+        Name('/Resources'): Ref(resources_num, 0),
+    }
+    if rotate:
+        page[Name('/Rotate')] = rotate
+
+    objects = [(box_num, 0, [pdf.resolve(v) for v in box]), (resources_num, 0, {})]
+    objects += [(ref.num, 0, page) for ref in page_refs]
+
+    kids = root.get('/Kids')
+    if isinstance(kids, Ref):
+        # The kids array is an object of its own: update it there
+        objects.append((kids.num, pdf.generation(kids.num), pdf.resolve(kids) + page_refs))
+    else:
+        root[Name('/Kids')] = list(kids) + page_refs
+    root[Name('/Count')] = page_count + count
+    objects.append((pages_ref.num, pdf.generation(pages_ref.num), root))
+    return objects
+
+
+def _xref_table(entries, trailer):
+    """A classic xref section and trailer for (number, generation, offset) entries."""
+    out = [b'xref\n']
+    entries = sorted(entries)
+    i = 0
+    while i < len(entries):
+        j = i
+        while j + 1 < len(entries) and entries[j + 1][0] == entries[j][0] + 1:
+            j += 1
+        out.append(b'%d %d\n' % (entries[i][0], j - i + 1))
+        out += [b'%010d %05d n\r\n' % (offset, gen) for _, gen, offset in entries[i:j + 1]]
+        i = j + 1
+    out.append(b'trailer\n' + serialize(trailer) + b'\n')
+    return b''.join(out)
+
+
+def _xref_stream(entries, trailer, num, offset):
+    """An xref stream object (number num, written at offset) for entries."""
+    entries = sorted(entries + [(num, 0, offset)])
+    index = []
+    for n, _, _ in entries:
+        if index and index[-2] + index[-1] == n:
+            index[-1] += 1
+        else:
+            index += [n, 1]
+    data = b''.join(b'\x01' + off.to_bytes(4, 'big') + gen.to_bytes(2, 'big')
+                    for _, gen, off in entries)
+    stream = dict(trailer)
+    stream.update({
+        Name('/Type'): Name('/XRef'),
+        Name('/W'): [1, 4, 2],
+        Name('/Index'): index,
+        Name('/Length'): len(data),
+    })
+    return b'%d 0 obj\n' % num + serialize(stream) + b'\nstream\n' + data + b'\nendstream\nendobj\n'
+
+
+def append_blank_pages(path, count, output_file=None):
+    """
+    Add count blank pages, like the document's last page, to the end of
+    path by incremental update. With output_file the update goes onto a
+    copy of path instead (the copy itself is a plain file copy).
+
+    Returns the file written. Raises RawPdfError for files this cannot
+    update (encrypted, damaged or unusual ones) and OSError for I/O errors;
+    the file is not touched in either case.
+    """
+    if count < 1:
+        raise ValueError('count must be at least 1')
+
+    with RawPdf(path) as pdf:
+        if '/Encrypt' in pdf.trailer:
+            raise RawPdfError('encrypted documents cannot be updated in place')
+        size = pdf.trailer.get('/Size')
+        if not isinstance(size, int):
+            raise RawPdfError('trailer has no /Size')
+        objects = _updated_pages(pdf, count, size)
+        trailer = {Name(key): pdf.trailer[key] for key in ('/Root', '/Info', '/ID')
+                   if key in pdf.trailer}
+        prev = pdf.startxref
+        xref_is_stream = pdf.xref_is_stream
+        ends_with_newline = pdf.buf[-1:] in (b'\n', b'\r')
+
+    if output_file is not None:
+        shutil.copyfile(path, output_file)
+        path = output_file
+
+    start = os.path.getsize(path)
+    chunk = bytearray() if ends_with_newline else bytearray(b'\n')
+    entries = []
+    for num, gen, value in objects:
+        entries.append((num, gen, start + len(chunk)))
+        chunk += b'%d %d obj\n' % (num, gen) + serialize(value) + b'\nendobj\n'
+
+    xref_offset = start + len(chunk)
+    if xref_is_stream:
+        trailer.update({Name('/Size'): size + count + 3, Name('/Prev'): prev})
+        chunk += _xref_stream(entries, trailer, size + count + 2, xref_offset)
+    else:
+        trailer.update({Name('/Size'): size + count + 2, Name('/Prev'): prev})
+        chunk += _xref_table(entries, trailer)
+    chunk += b'startxref\n%d\n%%%%EOF\n' % xref_offset
+
+    with open(path, 'ab') as f:
+        f.write(chunk)
+    return path
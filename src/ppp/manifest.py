@@ -0,0 +1,111 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+Run manifests for resumable workflows.
+Every run keeps ppp-manifest.json in its output directory. It records the
+source (by content hash), the answers that shaped the plan, the stages that
+have finished and each unit of work (a signature or a print job) with the
+hashes of the files it produced. `ppp --resume` reads it back, replays the
+answers and skips every unit whose files are still intact.
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from ppp.cache import file_digest
+
+MANIFEST_NAME = 'ppp-manifest.json'
+MANIFEST_VERSION = 1
+
+
+def manifest_path(output_dir):
+    return os.path.join(output_dir, MANIFEST_NAME)
+
+
+def new_manifest(source, answers):
+    """
+    A fresh manifest for source. answers holds the choices that shaped the
+    plan (resize, signatures, impose, combine, ...), as JSON-able values.
+    """
+    return {
+        'version': MANIFEST_VERSION,
+        'source': os.path.abspath(source),
+        'source_sha256': file_digest(source),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'answers': dict(answers),
+        'stages': [],
+        'units': {},
+    }
+
+
+def load(output_dir):
+    """Read the manifest in output_dir, or None if there is no usable one."""
+    try:
+        with open(manifest_path(output_dir)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save(output_dir, manifest):
+    """Atomically write the manifest, so a crash never leaves half a file."""
+    os.makedirs(output_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=output_dir, prefix='.manifest-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    os.replace(tmp, manifest_path(output_dir))
+
+
+def matches_source(manifest, source):
+    """True if manifest was made for a file with source's exact contents."""
+    return manifest.get('source_sha256') == file_digest(source)
+
+
+def stage_done(manifest, stage):
+    if stage not in manifest['stages']:
+        manifest['stages'].append(stage)
+
+
+def record_unit(manifest, unit, files):
+    """Record that unit finished, producing files (paths)."""
+    manifest['units'][unit] = {
+        'files': {os.path.basename(path): file_digest(path) for path in files},
+    }
+
+
+def forget_unit(manifest, unit):
+    manifest['units'].pop(unit, None)
+
+
+def unit_done(manifest, unit, output_dir, expected=None):
+    """
+    True if unit finished in an earlier run and its files are still in
+    output_dir unchanged. expected, if given, lists the file names the unit
+    must have produced.
+    """
+    entry = manifest['units'].get(unit)
+    if entry is None:
+        return False
+    files = entry.get('files', {})
+    if expected is not None and set(expected) != set(files):
+        return False
+    for name, digest in files.items():
+        path = os.path.join(output_dir, name)
+        try:
+            if file_digest(path) != digest:
+                return False
+        except OSError:
+            return False
+    return True
@@ -12,6 +12,8 @@ import argparse
 from pdftools import pdf_merge
 from pdftools.parseutil import parentparser
 
+from ppp.streammerge import stream_merge
+
 
 def process_arguments(args):
     parser = argparse.ArgumentParser(
@@ -43,12 +45,28 @@ def process_arguments(args):
         help="delete input files after merge",
     )
 
+    # streaming
+    parser.add_argument(
+        "-s",
+        "--stream",
+        action="store_true",
+        help=(
+            "copy one input at a time straight to the output, so memory use "
+            "stays flat however many inputs there are (pages only: outlines "
+            "and other document-level data are dropped)"
+        ),
+    )
+
     return parser.parse_args(args)
 
 
 def main():
     args = process_arguments(sys.argv[1:])
-    pdf_merge(args.inputs, args.output, args.delete)
+    if args.stream:
+        pages = stream_merge(args.inputs, args.output, args.delete)
+        print(f"Merged {len(args.inputs)} file(s), {pages} pages, into {args.output}")
+    else:
+        pdf_merge(args.inputs, args.output, args.delete)
 
 
 if __name__ == "__main__":
@@ -14,29 +14,23 @@ Adds blank pages to make page count a multiple of 4.
 
 import sys
 import os
-import subprocess
-import PyPDF2
 
-from ppp._util import get_data_path
+from ppp import pageplan
+from ppp._rawpdf import RawPdfError
+from ppp.incremental import append_blank_pages
+from ppp.probe import get_page_count
 
-def get_page_count(filename):
-    """Get page count from a PDF file."""
-    try:
-        with open(filename, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            return len(reader.pages)
-    except Exception as e:
-        print(f'ERROR: Could not read PDF file: {e}')
-        return None
-
-def pad_pdf(source_file, output_file=None, target_multiple=4):
+def pad_pdf(source_file, output_file=None, target_multiple=4, incremental=False):
     """
     Pad a PDF to make its page count a multiple of target_multiple.
 
     Args:
         source_file: Input PDF filename
-        output_file: Output PDF filename (default: padded-{source_file})
+        output_file: Output PDF filename (default: padded-{source_file});
+            may be source_file itself when incremental is set
         target_multiple: Target multiple for page count (default: 4)
+        incremental: Append the blank pages as an incremental update
+            instead of rewriting the document (see ppp.incremental)
 
     Returns:
         True if padding was successful or unnecessary, False otherwise
@@ -62,32 +56,33 @@ def pad_pdf(source_file, output_file=None, target_multiple=4):
 
     # Calculate pages to add
     pages_to_add = target_multiple - remainder
-    padding_file = f'{pages_to_add}pp.pdf'
-
-    # Look for padding file in cwd and package data
-    padding_path = get_data_path(padding_file)
-
-    if padding_path is None:
-        print(f'ERROR: Padding file "{padding_file}" not found.')
-        return False
 
     # Set output filename
     if output_file is None:
         base, ext = os.path.splitext(source_file)
         output_file = f'padded-{base}{ext}'
 
+    in_place = os.path.isfile(output_file) and os.path.samefile(source_file, output_file)
+    if in_place and not incremental:
+        print('ERROR: Padding in place needs an incremental update (--in-place).')
+        return False
+
     # Check if output file already exists
-    if os.path.isfile(output_file):
+    if os.path.isfile(output_file) and not in_place:
         response = input(f'Output file "{output_file}" already exists. Overwrite? [y/n]: ').strip().lower()
         if response not in ['y', 'yes']:
             print('Aborted.')
             return False
 
-    # Run pdftk to concatenate
-    print(f'Adding {pages_to_add} blank page(s) from {padding_file}...')
+    # Blank pages are generated the size of the last page
+    print(f'Adding {pages_to_add} blank page(s)...')
     try:
-        cmd = ['pdftk', f'A={source_file}', f'B={padding_path}', 'cat', 'A', 'B', 'output', output_file]
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        if incremental:
+            append_blank_pages(source_file, pages_to_add, None if in_place else output_file)
+        else:
+            pages = pageplan.source_pages(source_file)
+            size = pageplan.last_page_size(source_file)
+            pageplan.write_pdf(pageplan.pad(pages, pages_to_add, size), output_file)
 
         # Verify the output
         new_page_count = get_page_count(output_file)
@@ -98,8 +93,9 @@ def pad_pdf(source_file, output_file=None, target_multiple=4):
             print(f'WARNING: Expected {page_count + pages_to_add} pages but got {new_page_count}.')
             return False
 
-    except subprocess.CalledProcessError as e:
-        print(f'ERROR: pdftk failed: {e.stderr}')
+    except RawPdfError as e:
+        print(f'ERROR: Cannot append to {source_file}: {e}')
+        print('Pad it without --append/--in-place to rewrite it instead.')
         return False
     except Exception as e:
         print(f'ERROR: {e}')
@@ -107,8 +103,13 @@ def pad_pdf(source_file, output_file=None, target_multiple=4):
 
 def main():
     """Main entry point for command-line usage."""
-    if len(sys.argv) < 2:
-        print('Usage: ppp-pad <input.pdf> [output.pdf] [target_multiple]')
+    args = sys.argv[1:]
+    in_place = '--in-place' in args
+    incremental = in_place or '--append' in args
+    args = [a for a in args if a not in ('--append', '--in-place')]
+    if not args or (in_place and len(args) > 2):
+        print('Usage: ppp-pad [--append] <input.pdf> [output.pdf] [target_multiple]')
+        print('       ppp-pad --in-place <input.pdf> [target_multiple]')
         print('')
         print('Automatically pads a PDF with blank pages to make page count')
         print('a multiple of target_multiple (default: 4)')
@@ -117,13 +118,21 @@ def main():
         print('  ppp-pad book.pdf                 # Creates padded-book.pdf')
         print('  ppp-pad book.pdf ready.pdf       # Creates ready.pdf')
         print('  ppp-pad book.pdf ready.pdf 32    # Pad to multiple of 32')
+        print('  ppp-pad --in-place scan.pdf      # Append blank pages to scan.pdf itself')
+        print('')
+        print('--append and --in-place add the pages as a PDF incremental update:')
+        print('the original bytes are kept and only the new pages are written.')
         sys.exit(1)
 
-    source_file = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else None
-    target_multiple = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    source_file = args[0]
+    if in_place:
+        output_file = source_file
+        target_multiple = int(args[1]) if len(args) > 1 else 4
+    else:
+        output_file = args[1] if len(args) > 1 else None
+        target_multiple = int(args[2]) if len(args) > 2 else 4
 
-    success = pad_pdf(source_file, output_file, target_multiple)
+    success = pad_pdf(source_file, output_file, target_multiple, incremental)
     sys.exit(0 if success else 1)
 
 if __name__ == '__main__':
@@ -0,0 +1,452 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+Lazy page plans.
+A page plan is a list of page references (source file, page index and an
+optional transform) and imposed sheets built from them. Padding, splitting,
+imposition and combining only rearrange these lists; the source PDF is read
+and output written once, when a plan is rendered to a deliverable file.
+"""
+
+import hashlib
+from collections import namedtuple
+
+import PyPDF2
+from PyPDF2.generic import (
+    ArrayObject,
+    DictionaryObject,
+    FloatObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    StreamObject,
+)
+
+from ppp._rawpdf import RawPdf, RawPdfError, descend_page_tree
+from ppp.impose import (
+    LETTER,
+    Cell,
+    add_sheet,
+    cell_matrix,
+    display_matrix,
+    multiply,
+    nup_cells,
+    nup_order,
+    page_xobject,
+)
+from ppp.probe import probe
+
+PageRef = namedtuple('PageRef', ['source', 'index', 'matrix', 'size'], defaults=(None, None))
+PageRef.__doc__ = """\
+One page of a plan.
+
+source and index name a page of a PDF file (index is 0-based); a source of
+None is a blank page. If size is given the page is drawn onto a new page
+of that size: through matrix, which maps the page's displayed space onto
+it, or else scaled to fit and centred. With neither, the page is used
+as-is.
+"""
+
+Sheet = namedtuple('Sheet', ['size', 'placements'])
+Sheet.__doc__ = """\
+One imposed output page of the given size.
+
+placements is a list of (PageRef, slot) pairs; each slot is a matrix
+putting the page's displayed (and transformed) space onto the sheet, or an
+impose.Cell the page is fitted into.
+"""
+
+
+def blank(size):
+    """A blank page of size (width, height) in points."""
+    return PageRef(None, None, None, size)
+
+
+def fit_matrix(width, height, size):
+    """
+    Matrix scaling a width x height page to fit size, centred, the way
+    ghostscript's -dPDFFitPage does. The aspect ratio is kept.
+    """
+    target_w, target_h = size
+    scale = min(target_w / width, target_h / height)
+    return (scale, 0, 0, scale, (target_w - width * scale) / 2, (target_h - height * scale) / 2)
+
+
+def source_pages(path):
+    """Plan for every page of path, in order."""
+    return [PageRef(path, i) for i in range(probe(path).page_count)]
+
+
+def pad(pages, count, size):
+    """
+    pages followed by count blank pages of the given size. Blank pages are
+    made when the plan is rendered; no padding files are needed.
+    """
+    return list(pages) + [blank(size)] * count
+
+
+def displayed_size(path, index):
+    """
+    Size of page index of path as displayed, crop box and /Rotate applied,
+    the same as impose.display_matrix gives the native imposer.
+    """
+    try:
+        with RawPdf(path) as pdf:
+            return pdf.display_size(index)
+    except Exception:
+        # Damaged or unusual file: the full parser copes with more
+        pass
+    with open(path, 'rb') as f:
+        return display_matrix(PyPDF2.PdfReader(f).pages[index])[1:]
+
+
+def last_page_size(path):
+    """Displayed size of path's last page, for blank pages that match it."""
+    return displayed_size(path, probe(path).page_count - 1)
+
+
+def resize(pages, size):
+    """
+    Plan pages scaled to fit size. Nothing is re-encoded: when rendered,
+    each page's content is reused as-is and only placed with a new matrix.
+    """
+    return [blank(size) if ref.source is None else ref._replace(matrix=None, size=size)
+            for ref in pages]
+
+
+def split(pages, sig_sizes):
+    """Cut a plan into consecutive signatures of the given sizes."""
+    if sum(sig_sizes) != len(pages):
+        raise ValueError(f'signatures hold {sum(sig_sizes)} pages but the plan has {len(pages)}')
+    signatures = []
+    first = 0
+    for size in sig_sizes:
+        signatures.append(pages[first:first + size])
+        first += size
+    return signatures
+
+
+def impose(pages, sheet_size=LETTER, nup=2, scheme='sheetwise', nested=True):
+    """
+    Impose one signature nup-up, like impose.impose_nup; the default is
+    2-up in booklet order, like impose.impose_2up.
+
+    Returns a list of Sheet, one per sheet side. Blank pages, whether
+    padding or the fill up to whole sheets, are simply left empty.
+    """
+    first = next((ref for ref in pages if ref.source is not None), None)
+    page_size = None
+    if first is not None:
+        page_size = first.size or displayed_size(first.source, first.index)
+    cells = nup_cells(nup, scheme, sheet_size, page_size)
+    sheets = []
+    for side in nup_order(len(pages), nup, scheme, nested):
+        placements = []
+        for index, column, row, upside_down in side:
+            if index is not None and pages[index].source is not None:
+                placements.append((pages[index], cells[column, row, upside_down]))
+        sheets.append(Sheet(sheet_size, placements))
+    return sheets
+
+
+_INHERITABLE = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+
+def _resolve(value):
+    """A PyPDF2 value with any indirect reference followed."""
+    return value.get_object() if hasattr(value, 'get_object') else value
+
+
+def _lookup_page(reader, index, flat=None):
+    """
+    reader.pages[index] without flattening the whole page tree first.
+
+    PyPDF2 parses every page object the first time any page is asked for,
+    which costs seconds on a long book and is repeated by every worker.
+    Descending by /Count (see _rawpdf.descend_page_tree, which flat is
+    kept for) only touches the nodes on the way to the page.
+    """
+    try:
+        node, ref, ancestors = descend_page_tree(
+            reader.trailer['/Root']['/Pages'].get_object(), index, _resolve, flat)
+    except (RawPdfError, KeyError, AttributeError):
+        # Damaged or unusual tree: let PyPDF2 sort it out
+        return reader.pages[index]
+    if ref is None:
+        return reader.pages[index]
+    page = PyPDF2.PageObject(reader, ref)
+    page.update(node)
+    inherited = {}
+    for ancestor in ancestors:
+        for key in _INHERITABLE:
+            if key in ancestor:
+                inherited[key] = ancestor.raw_get(key)
+    for key, value in inherited.items():
+        if key not in page:
+            page[NameObject(key)] = value
+    return page
+
+
+def plan_inputs(items):
+    """
+    Describe a plan for cache keys: (source files, JSON-able structure)
+    where pages refer to sources by position rather than by path.
+    """
+    sources = []
+    positions = {}
+
+    def ref_params(ref):
+        if ref.source is None:
+            return ['blank', ref.size]
+        if ref.source not in positions:
+            positions[ref.source] = len(sources)
+            sources.append(ref.source)
+        return [positions[ref.source], ref.index, ref.matrix, ref.size]
+
+    params = []
+    for item in items:
+        if isinstance(item, Sheet):
+            params.append(['sheet', item.size,
+                           [[ref_params(ref), slot] for ref, slot in item.placements]])
+        else:
+            params.append(ref_params(item))
+    return sources, params
+
+
+class Sources:
+    """
+    The source files a plan refers to, each opened and parsed once.
+
+    Use as a context manager so the files are closed afterwards.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._readers = {}
+        self._flat = {}
+
+    def page(self, ref):
+        reader = self._readers.get(ref.source)
+        if reader is None:
+            f = open(ref.source, 'rb')
+            self._files[ref.source] = f
+            reader = self._readers[ref.source] = PyPDF2.PdfReader(f)
+            self._flat[ref.source] = {}
+        return _lookup_page(reader, ref.index, self._flat[ref.source])
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        self._readers.clear()
+        self._flat.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _add_blank(writer, size, blanks):
+    """
+    Add a blank page of size to writer. Every blank page of one size refers
+    to the same /MediaBox and empty /Resources objects (blanks caches
+    them), so each one only costs its page dictionary.
+    """
+    shared = blanks.get(size)
+    if shared is None:
+        shared = blanks[size] = (
+            writer._add_object(ArrayObject(FloatObject(v) for v in (0, 0, *size))),
+            writer._add_object(DictionaryObject()),
+        )
+    page = PyPDF2.PageObject()
+    page[NameObject('/Type')] = NameObject('/Page')
+    page[NameObject('/MediaBox')] = shared[0]
+    page[NameObject('/Resources')] = shared[1]
+    writer.add_page(page)
+
+
+def _placement(sources, ref, xobjects, writer):
+    """
+    XObject and base matrix drawing ref's displayed page at the origin,
+    and the size it is drawn at.
+    """
+    key = (ref.source, ref.index)
+    page = sources.page(ref)
+    if key not in xobjects:
+        xobjects[key] = page_xobject(writer, page)
+    matrix, width, height = display_matrix(page)
+    if ref.matrix is not None:
+        matrix = multiply(matrix, ref.matrix)
+    elif ref.size is not None:
+        matrix = multiply(matrix, fit_matrix(width, height, ref.size))
+    if ref.size is not None:
+        width, height = ref.size
+    return xobjects[key], matrix, (width, height)
+
+
+def render(writer, items, sources):
+    """
+    Append a plan (PageRefs and Sheets) to writer.
+
+    A page used more than once (like the spacer between signatures) gets a
+    new page object each time, but they all share its content and
+    resources, so the page data is only stored once.
+    """
+    xobjects = {}
+    added = {}
+    blanks = {}
+    for item in items:
+        if isinstance(item, Sheet):
+            placements = []
+            for ref, slot in item.placements:
+                xobject, matrix, size = _placement(sources, ref, xobjects, writer)
+                if isinstance(slot, Cell):
+                    slot = cell_matrix(slot, *size)
+                placements.append((xobject, multiply(matrix, slot)))
+            add_sheet(writer, item.size, placements)
+        elif item.source is None:
+            _add_blank(writer, tuple(item.size), blanks)
+        elif item.size is None:
+            key = (item.source, item.index)
+            if key in added:
+                page = PyPDF2.PageObject()
+                page.update((k, v) for k, v in added[key].items() if k != '/Parent')
+                writer.add_page(page)
+            else:
+                added[key] = writer.add_page(sources.page(item))
+        else:
+            add_sheet(writer, item.size, [_placement(sources, item, xobjects, writer)[:2]])
+
+
+_UNSHARED_TYPES = ('/Page', '/Pages', '/Catalog')
+
+
+def _shape(obj, writer, parts, refs):
+    """
+    Serialize obj into parts, leaving each reference to one of writer's
+    objects as a slot and listing its index in refs. Stream data is hashed.
+    """
+    if isinstance(obj, IndirectObject):
+        if obj.pdf is writer:
+            parts.append(b'R;')
+            refs.append(obj.idnum - 1)
+        else:
+            parts.append(b'X%d:%d;' % (id(obj.pdf), obj.idnum))
+    elif isinstance(obj, DictionaryObject):
+        stream = isinstance(obj, StreamObject)
+        parts.append(b'<<')
+        for key in sorted(obj):
+            if stream and key == '/Length':
+                continue
+            parts.append(key.encode('utf-8', 'surrogateescape') + b' ')
+            _shape(obj.raw_get(key), writer, parts, refs)
+        parts.append(b'>>')
+        if stream:
+            parts.append(b'S' + hashlib.sha256(obj._data).digest())
+    elif isinstance(obj, ArrayObject):
+        parts.append(b'[')
+        for item in obj:
+            _shape(item, writer, parts, refs)
+        parts.append(b']')
+    else:
+        parts.append(f'{type(obj).__name__}:{obj!r};'.encode('utf-8', 'backslashreplace'))
+
+
+def _redirect(obj, writer, canon):
+    """Point references in obj (in place) at each object's representative."""
+    if isinstance(obj, DictionaryObject):
+        items = [(key, obj.raw_get(key)) for key in obj]
+    elif isinstance(obj, ArrayObject):
+        items = list(enumerate(obj))
+    else:
+        return
+    for key, value in items:
+        if isinstance(value, IndirectObject):
+            if value.pdf is writer and canon[value.idnum - 1] != value.idnum - 1:
+                obj[key] = IndirectObject(canon[value.idnum - 1] + 1, 0, writer)
+        else:
+            _redirect(value, writer, canon)
+
+
+def share_resources(writer):
+    """
+    Merge identical objects in writer, so fonts, images, ICC profiles and
+    forms repeated across signatures are stored once. Returns the number
+    of objects merged away.
+
+    Objects are compared by their contents with references compared by
+    target, refining until nothing more merges: two fonts whose font files
+    were merged in one round merge in the next. Pages and the page tree are
+    never merged.
+    """
+    objects = writer._objects
+    canon = list(range(len(objects)))
+    candidates = [i for i, obj in enumerate(objects)
+                  if isinstance(obj, DictionaryObject) and obj.get('/Type') not in _UNSHARED_TYPES
+                  and (writer._info is None or i != writer._info.idnum - 1)]
+    shapes = {}
+    for i in candidates:
+        parts = []
+        refs = []
+        _shape(objects[i], writer, parts, refs)
+        shapes[i] = hashlib.sha256(b''.join(parts)).digest(), refs
+
+    changed = True
+    while changed:
+        changed = False
+        seen = {}
+        for i in candidates:
+            digest, refs = shapes[i]
+            key = digest, tuple(canon[r] for r in refs)
+            first = seen.setdefault(key, canon[i])
+            if first != canon[i]:
+                canon[i] = first
+                changed = True
+        # Representatives are merged first-come, so follow each to its root
+        for i in candidates:
+            while canon[canon[i]] != canon[i]:
+                canon[i] = canon[canon[i]]
+
+    merged = [i for i in candidates if canon[i] != i]
+    if not merged:
+        return 0
+    for i, obj in enumerate(objects):
+        if canon[i] == i:
+            _redirect(obj, writer, canon)
+    # Leave a null in each merged object's slot so object numbers, and
+    # with them the cross-reference table, stay as they are
+    for i in merged:
+        objects[i] = NullObject()
+    return len(merged)
+
+
+def write_pdf(items, output_file, sources=None, share=None):
+    """
+    Render a plan to output_file. Returns the number of pages written.
+
+    With share, identical resources are stored once (see share_resources).
+    By default that is done when the plan draws on more than one file, as
+    a print job of separately imposed signatures does; pages from a single
+    file already share their resources.
+    """
+    if share is None:
+        share = len(plan_inputs(items)[0]) > 1
+    if sources is None:
+        with Sources() as sources:
+            return write_pdf(items, output_file, sources, share)
+
+    writer = PyPDF2.PdfWriter()
+    render(writer, items, sources)
+    if share:
+        share_resources(writer)
+    with open(output_file, 'wb') as out:
+        writer.write(out)
+    return len(items)
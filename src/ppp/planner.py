@@ -0,0 +1,290 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+Signature planner.
+Searches mixed signature sizes with dynamic programming and returns a
+ranked Pareto set of plans under a configurable cost model. Sizes are
+multiples of 4 pages, so the search runs in 4-page units and stays in the
+millisecond range even for 5,000-page books.
+"""
+
+import csv
+import json
+import os
+from collections import namedtuple
+
+VALID_SIG_SIZES = [4, 8, 12, 16, 20, 24, 28, 32, 36, 40, 44, 48]
+PREFERRED_SIZES = (32, 36)  # Biggest that still fold cleanly
+
+CostModel = namedtuple(
+    'CostModel',
+    ['blank_page', 'sheet', 'signature', 'off_preference', 'mixed_size', 'preferred'],
+    defaults=(1.0, 0.25, 3.0, 3.0, 1.0, PREFERRED_SIZES),
+)
+CostModel.__doc__ = """\
+Weights used to rank signature plans (lower total cost is better).
+
+blank_page: cost of each blank page added as padding
+sheet: cost of each printed sheet (4 pages at 2-up)
+signature: cost of each signature (folding, sewing, handling)
+off_preference: extra cost of each signature not in `preferred`
+mixed_size: extra cost of each distinct size beyond the first
+preferred: signature sizes that carry no off_preference cost
+"""
+
+Plan = namedtuple('Plan', ['description', 'sig_sizes', 'blank_pages', 'sheets', 'signatures', 'cost'])
+Plan.__doc__ = """\
+One way to cut a book into signatures.
+
+sig_sizes lists the signature sizes in print order (largest first), and
+blank_pages is how many blank pages must be added to fill them.
+"""
+
+
+def describe(sig_sizes):
+    """Human-readable summary, e.g. '3 × 32-page + 1 × 28-page'."""
+    counts = []
+    for size in sig_sizes:
+        if counts and counts[-1][0] == size:
+            counts[-1][1] += 1
+        else:
+            counts.append([size, 1])
+    if len(counts) == 1:
+        size, n = counts[0]
+        return f'{n} × {size}-page signature' + ('s' if n != 1 else '')
+    return ' + '.join(f'{n} × {size}-page' for size, n in counts)
+
+
+def _cheapest(total_units, unit_costs):
+    """
+    Exact-sum unbounded knapsack over 4-page units.
+
+    Returns choice[t], the size (in units) of the last signature of the
+    cheapest composition of t units, or 0 if t cannot be composed.
+    """
+    inf = float('inf')
+    best = [inf] * (total_units + 1)
+    choice = [0] * (total_units + 1)
+    best[0] = 0.0
+    # Largest sizes first, so ties go to fewer, bigger signatures
+    unit_costs = sorted(unit_costs.items(), reverse=True)
+    for t in range(1, total_units + 1):
+        for units, cost in unit_costs:
+            if units <= t:
+                candidate = best[t - units] + cost
+                if candidate < best[t]:
+                    best[t] = candidate
+                    choice[t] = units
+    return choice
+
+
+def _compose(choice, units):
+    sizes = []
+    while units > 0:
+        step = choice[units]
+        if step == 0:
+            return None
+        sizes.append(step * 4)
+        units -= step
+    return sorted(sizes, reverse=True)
+
+
+def plan_signatures(page_count, sizes=None, cost=None, max_blank_pages=8,
+                    max_signatures=None, min_size=None, limit=None):
+    """
+    Plan signature configurations for a document of page_count pages.
+
+    Args:
+        page_count: Pages in the document
+        sizes: Allowed signature sizes (default: VALID_SIG_SIZES)
+        cost: CostModel used for ranking (default: CostModel())
+        max_blank_pages: Most blank pages a plan may add
+        max_signatures: Most signatures a plan may use (default: no limit)
+        min_size: Smallest signature size to use (default: 16 for books
+            over 100 pages, else 8)
+        limit: Return at most this many plans (default: all)
+
+    Returns the Pareto set over (blank pages, signatures, signatures off
+    the preferred sizes, distinct sizes), ranked by total cost, followed
+    by the dominated plans (ones another plan matches or beats on every
+    count), also by cost. The front alone is often a single plan, so the
+    rest keep a choice on offer when limit asks for more.
+    """
+    if cost is None:
+        cost = CostModel()
+    if sizes is None:
+        sizes = VALID_SIG_SIZES
+    if min_size is None:
+        min_size = 16 if page_count > 100 else 8
+    sizes = sorted({s for s in sizes if s % 4 == 0 and s >= min_size})
+    if page_count <= 0 or not sizes:
+        return []
+
+    preferred = set(cost.preferred)
+    min_units = -(-page_count // 4)
+    max_units = (page_count + max_blank_pages) // 4
+
+    # A few weightings trace out different corners of the trade-off; each
+    # DP pass answers every padded length at once.
+    weightings = [
+        {s // 4: cost.signature + (0 if s in preferred else cost.off_preference) for s in sizes},
+        {s // 4: 1.0 for s in sizes},
+        {s // 4: 1.0 + (0 if s in preferred else len(sizes) * page_count) for s in sizes},
+        {s // 4: 1.0 + (0 if s in preferred else 1e-3) for s in sizes},
+    ]
+
+    found = set()
+
+    def consider(sig_sizes):
+        blanks = sum(sig_sizes) - page_count
+        if 0 <= blanks <= max_blank_pages and (
+                max_signatures is None or len(sig_sizes) <= max_signatures):
+            found.add(tuple(sorted(sig_sizes, reverse=True)))
+
+    for unit_costs in weightings:
+        choice = _cheapest(max_units, unit_costs)
+        for units in range(min_units, max_units + 1):
+            sig_sizes = _compose(choice, units)
+            if sig_sizes is not None:
+                consider(sig_sizes)
+
+    # The DP cannot see how many distinct sizes a plan mixes, so also offer
+    # the simple shapes: all one size, or one size plus a smaller last one.
+    for size in sizes:
+        full, remainder = divmod(page_count, size)
+        consider([size] * (full + (1 if remainder else 0)))
+        if remainder and full:
+            final = next((s for s in sizes if remainder <= s < size), None)
+            if final is not None:
+                consider([size] * full + [final])
+
+    plans = []
+    for sig_sizes in found:
+        blanks = sum(sig_sizes) - page_count
+        off = sum(1 for s in sig_sizes if s not in preferred)
+        mixed = len(set(sig_sizes)) - 1
+        sheets = (page_count + blanks) // 4
+        total = (blanks * cost.blank_page + sheets * cost.sheet
+                 + len(sig_sizes) * cost.signature + off * cost.off_preference
+                 + mixed * cost.mixed_size)
+        plans.append((Plan(describe(sig_sizes), list(sig_sizes), blanks, sheets,
+                           len(sig_sizes), total), (blanks, len(sig_sizes), off, mixed)))
+
+    def dominated(score, others):
+        return any(o != score and all(a <= b for a, b in zip(o, score)) for o in others)
+
+    def rank(p):
+        return p.cost, p.blank_pages, p.signatures
+
+    scores = [score for _, score in plans]
+    pareto, rest = [], []
+    for plan, score in plans:
+        (rest if dominated(score, scores) else pareto).append(plan)
+    ranked = sorted(pareto, key=rank) + sorted(rest, key=rank)
+    return ranked[:limit] if limit is not None else ranked
+
+
+def parse_sig_sizes(text):
+    """
+    Parse a signature list such as "32,32,28" (or a list of ints) into
+    [32, 32, 28]. Raises ValueError on anything that is not a valid size.
+    """
+    if isinstance(text, (list, tuple)):
+        sizes = list(text)
+    else:
+        try:
+            sizes = [int(part) for part in str(text).replace(' ', ',').split(',') if part.strip()]
+        except ValueError:
+            raise ValueError(f'invalid signature list: {text!r}')
+    for size in sizes:
+        if not isinstance(size, int) or size not in VALID_SIG_SIZES:
+            raise ValueError(
+                f'signature size {size} must be one of: {", ".join(map(str, VALID_SIG_SIZES))}')
+    if not sizes:
+        raise ValueError('signature list is empty')
+    return sizes
+
+
+# Plan files: one row per source document, so a batch can be planned once
+# and executed later. CSV columns are file,pages,signatures (signatures as
+# "32,32,28"); JSON is {"plans": [{"file": ..., "pages": ..., "signatures":
+# [...]}, ...]}. The format follows the file extension.
+
+PlanEntry = namedtuple('PlanEntry', ['file', 'pages', 'sig_sizes'])
+PlanEntry.__doc__ = """\
+The signature sizes chosen for one source file.
+
+pages is the page count the plan was made for, or None if unknown.
+"""
+
+PLAN_FIELDS = ['file', 'pages', 'signatures']
+
+
+def _is_json(path):
+    return path.lower().endswith('.json')
+
+
+def write_plan_file(path, entries):
+    """
+    Write PlanEntry rows to path as CSV, or JSON if path ends in .json.
+    File names are stored relative to the plan file's directory.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    entries = [e._replace(file=os.path.relpath(os.path.abspath(e.file), base))
+               for e in entries]
+    if _is_json(path):
+        rows = [{'file': e.file, 'pages': e.pages, 'signatures': list(e.sig_sizes)}
+                for e in entries]
+        with open(path, 'w') as f:
+            json.dump({'plans': rows}, f, indent=2)
+            f.write('\n')
+        return
+
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(PLAN_FIELDS)
+        for e in entries:
+            writer.writerow([e.file, '' if e.pages is None else e.pages,
+                             ','.join(map(str, e.sig_sizes))])
+
+
+def read_plan_file(path):
+    """
+    Read PlanEntry rows from a CSV or JSON plan file.
+
+    Relative file names are taken relative to the plan file's directory.
+    Raises ValueError if the file is malformed.
+    """
+    if _is_json(path):
+        with open(path) as f:
+            data = json.load(f)
+        rows = data.get('plans') if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise ValueError(f'{path}: expected a "plans" list')
+    else:
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        if rows and not {'file', 'signatures'} <= set(rows[0]):
+            raise ValueError(f'{path}: CSV needs "file" and "signatures" columns')
+
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    for line, row in enumerate(rows, 1):
+        try:
+            name = row['file']
+            pages = row.get('pages')
+            pages = int(pages) if pages not in (None, '') else None
+            sig_sizes = parse_sig_sizes(row['signatures'])
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            raise ValueError(f'{path}: bad plan entry {line}: {e}')
+        if pages is not None and pages != sum(sig_sizes):
+            raise ValueError(f'{path}: entry {line}: signatures add up to '
+                             f'{sum(sig_sizes)} pages, not {pages}')
+        entries.append(PlanEntry(os.path.join(base, os.path.expanduser(name)), pages, sig_sizes))
+    return entries
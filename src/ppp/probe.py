@@ -0,0 +1,222 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+Cached PDF metadata probe shared by every PPP stage.
+Answers page count, page sizes, encryption status and file size, and
+memoizes the answer by (path, size, mtime, inode) so a file is parsed at
+most once per run. Set PPP_PROBE_CACHE=1 (or call
+enable_persistent_cache()) to also keep results across runs.
+"""
+
+import json
+import os
+import tempfile
+from collections import namedtuple
+from multiprocessing.util import Finalize
+
+import PyPDF2
+
+from ppp._rawpdf import RawPdf, RawPdfError
+from ppp._util import cache_dir
+
+PdfInfo = namedtuple('PdfInfo', ['path', 'file_size', 'page_count', 'encrypted', 'page_sizes'])
+PdfInfo.__doc__ = """\
+Metadata for one PDF file.
+
+page_sizes maps 0-based page indices to (width, height) in points, taken
+from each page's (inherited) MediaBox. Only the pages that were asked for
+are present.
+"""
+
+
+class ProbeError(Exception):
+    """The file could not be read as a PDF."""
+
+
+_memo = {}
+_persistent = {'enabled': os.environ.get('PPP_PROBE_CACHE', '') not in ('', '0'),
+               'path': None, 'loaded': False, 'dirty': False, 'registered': None}
+
+MAX_PERSISTENT_ENTRIES = 10_000
+
+
+def enable_persistent_cache(path=None):
+    """Keep probe results across runs, in path or <cache dir>/probe.json."""
+    _persistent['enabled'] = True
+    _persistent['path'] = path
+    _persistent['loaded'] = False
+
+
+def _cache_file():
+    return _persistent['path'] or os.path.join(cache_dir(), 'probe.json')
+
+
+def _file_key(path):
+    """Identity of a file's current contents: (realpath, size, mtime, inode)."""
+    st = os.stat(path)
+    return os.path.realpath(path), st.st_size, st.st_mtime_ns, st.st_ino
+
+
+def _read_cache_file():
+    """The entries in the cache file, as {key: PdfInfo}."""
+    try:
+        with open(_cache_file()) as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    found = {}
+    for entry in entries:
+        try:
+            key = tuple(entry['key'])
+            sizes = {int(i): tuple(size) for i, size in entry['page_sizes'].items()}
+            found[key] = PdfInfo(key[0], entry['file_size'], entry['page_count'],
+                                 entry['encrypted'], sizes)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return found
+
+
+def _load_persistent():
+    _persistent['loaded'] = True
+    for key, info in _read_cache_file().items():
+        _memo.setdefault(key, info)
+
+
+def _still_current(key):
+    """Whether the file key was made from is still there, unchanged."""
+    try:
+        return _file_key(key[0]) == key
+    except OSError:
+        return False
+
+
+def _save_persistent():
+    """
+    Merge this process's results into the cache file, dropping entries for
+    files that have since been deleted or changed, and keeping at most
+    MAX_PERSISTENT_ENTRIES. Runs once per process, at exit; the file is
+    replaced atomically, and processes saving at the same moment can still
+    lose each other's new entries.
+    """
+    if not _persistent['dirty']:
+        return
+    _persistent['dirty'] = False
+    merged = _read_cache_file()
+    merged.update(_memo)
+    current = [(key, info) for key, info in merged.items() if _still_current(key)]
+    # This process's results come last, so they are the ones kept
+    entries = [
+        {'key': list(key), 'file_size': info.file_size, 'page_count': info.page_count,
+         'encrypted': info.encrypted,
+         'page_sizes': {str(i): list(size) for i, size in info.page_sizes.items()}}
+        for key, info in current[-MAX_PERSISTENT_ENTRIES:]
+    ]
+    path = _cache_file()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.probe-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _mark_dirty():
+    """Note that the cache file needs saving, and arrange to save it at exit."""
+    _persistent['dirty'] = True
+    if _persistent['registered'] != os.getpid():
+        _persistent['registered'] = os.getpid()
+        # Unlike atexit, multiprocessing finalizers also run when a pool
+        # worker exits, and a forked worker drops the ones it inherited
+        Finalize(None, _save_persistent, exitpriority=0)
+
+
+def _fast_read(path, pages):
+    """
+    Read only the trailer, xref and page-tree nodes on the way to the
+    requested pages. Returns (page_count, encrypted, {index: (w, h)}).
+    """
+    with RawPdf(path) as pdf:
+        if '/Encrypt' in pdf.trailer:
+            raise RawPdfError('encrypted documents take the full parser')
+        page_count = pdf.page_count()
+        sizes = {i: pdf.page_size(i) for i in pages if 0 <= i < page_count}
+        return page_count, False, sizes
+
+
+def _read_pdf(path, pages):
+    """
+    Probe a file: fast path first, then a full PyPDF2 parse if the file is
+    damaged or uses something the fast reader does not handle.
+    Returns (page_count, encrypted, {index: (w, h)}).
+    """
+    try:
+        return _fast_read(path, pages)
+    except Exception:
+        pass
+
+    try:
+        with open(path, 'rb') as f:
+            reader = PyPDF2.PdfReader(f)
+            encrypted = reader.is_encrypted
+            if encrypted and not reader.decrypt(''):
+                raise ProbeError(f'{path} is encrypted')
+            page_count = len(reader.pages)
+            sizes = {}
+            for index in pages:
+                if 0 <= index < page_count:
+                    box = reader.pages[index].mediabox
+                    sizes[index] = (float(box.width), float(box.height))
+            return page_count, encrypted, sizes
+    except ProbeError:
+        raise
+    except Exception as e:
+        raise ProbeError(str(e)) from e
+
+
+def probe(path, pages=(0,)):
+    """
+    Return PdfInfo for path, with sizes for the given 0-based page indices.
+
+    Results are memoized; a later call asking for more pages only reads
+    the missing ones. Raises ProbeError if the file is not a readable PDF.
+    """
+    try:
+        key = _file_key(path)
+    except OSError as e:
+        raise ProbeError(str(e)) from e
+
+    if _persistent['enabled'] and not _persistent['loaded']:
+        _load_persistent()
+
+    info = _memo.get(key)
+    if info is not None:
+        missing = [i for i in pages if i not in info.page_sizes and 0 <= i < info.page_count]
+        if not missing:
+            return info
+        _, _, sizes = _read_pdf(path, missing)
+        info.page_sizes.update(sizes)
+    else:
+        page_count, encrypted, sizes = _read_pdf(path, pages)
+        info = PdfInfo(key[0], key[1], page_count, encrypted, sizes)
+        _memo[key] = info
+
+    if _persistent['enabled']:
+        _mark_dirty()
+    return info
+
+
+def get_page_count(filename):
+    """Get page count from a PDF file."""
+    try:
+        return probe(filename).page_count
+    except ProbeError as e:
+        print(f'ERROR: Could not read PDF file: {e}')
+        return None
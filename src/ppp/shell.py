@@ -4,49 +4,116 @@ These replace the original bash scripts (singledingle, flippar, etc.)
 so everything can be installed via a single `pipx install`.
 """
 
+import argparse
+import functools
 import glob
 import os
+import shlex
 import subprocess
 import shutil
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ppp import trace
+from ppp._util import atomic_output
+from ppp.impose import LETTER, SCHEMES, SHEET_SIZES, flip_edge, impose_2up, impose_nup
+
+
+def _missing_tool(tool):
+    """Say tool is not installed, and how to install it, then exit."""
+    print(f'ERROR: {tool} not found.')
+    if sys.platform == 'darwin':
+        hints = {
+            'pdftops': 'brew install poppler',
+            'psbook': 'brew install psutils',
+            'pstops': 'brew install psutils',
+            'ps2pdf': 'brew install ghostscript',
+            'calibredb': 'brew install calibre',
+        }
+    else:
+        hints = {
+            'pdftops': 'sudo apt install poppler-utils',
+            'psbook': 'sudo apt install psutils',
+            'pstops': 'sudo apt install psutils',
+            'ps2pdf': 'sudo apt install ghostscript',
+            'calibredb': 'sudo apt install calibre',
+        }
+    if tool in hints:
+        print(f'Install it with: {hints[tool]}')
+    sys.exit(1)
 
 
 def _run(cmd, description=None):
     """Run a command, printing errors on failure."""
     try:
-        subprocess.run(cmd, check=True)
+        trace.run(cmd, check=True)
     except FileNotFoundError:
-        tool = cmd[0]
-        print(f'ERROR: {tool} not found.')
-        if sys.platform == 'darwin':
-            hints = {
-                'pdftops': 'brew install poppler',
-                'psbook': 'brew install psutils',
-                'pstops': 'brew install psutils',
-                'ps2pdf': 'brew install ghostscript',
-                'calibredb': 'brew install calibre',
-            }
-        else:
-            hints = {
-                'pdftops': 'sudo apt install poppler-utils',
-                'psbook': 'sudo apt install psutils',
-                'pstops': 'sudo apt install psutils',
-                'ps2pdf': 'sudo apt install ghostscript',
-                'calibredb': 'sudo apt install calibre',
-            }
-        if tool in hints:
-            print(f'Install it with: {hints[tool]}')
-        sys.exit(1)
+        _missing_tool(cmd[0])
     except subprocess.CalledProcessError:
         if description:
             print(f'ERROR: {description} failed')
         sys.exit(1)
 
 
-def _cleanup_ps():
-    """Remove all .ps files in current directory."""
-    for f in glob.glob('*.ps'):
-        os.remove(f)
+def _pipeline(stages, inputs=(), outputs=()):
+    """
+    Run stages, a list of (cmd, message), as one pipeline: each command's
+    stdout feeds the next one's stdin and all of them run at once, so the
+    intermediate PostScript never touches the disk. Each message is
+    printed as its stage starts. Every stage that fails is reported with
+    its exit status before exiting.
+
+    Traced as a 'pipeline' span with a 'command' span per stage; each
+    stage is reaped with os.wait4() so its CPU time and peak memory are
+    its own, not the whole pipeline's.
+    """
+    procs = []
+    started = []
+    with trace.span('pipeline', 'command', inputs=inputs, outputs=outputs,
+                    cmd=' | '.join(shlex.join(cmd) for cmd, _ in stages)) as record:
+        upstream = None
+        for i, (cmd, message) in enumerate(stages):
+            print(message)
+            last = i == len(stages) - 1
+            try:
+                proc = subprocess.Popen(cmd, stdin=upstream,
+                                        stdout=None if last else subprocess.PIPE)
+                started.append(time.perf_counter())
+            except FileNotFoundError:
+                for proc in procs:
+                    proc.kill()
+                    proc.wait()
+                _missing_tool(cmd[0])
+            finally:
+                # The new stage holds its own copy; closing ours lets a
+                # writer see SIGPIPE if its reader dies
+                if upstream is not None:
+                    upstream.close()
+            upstream = proc.stdout
+            procs.append(proc)
+        codes = []
+        for proc, start, (cmd, _) in zip(procs, started, stages):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            codes.append(proc.returncode)
+            trace.child(os.path.basename(cmd[0]), start, usage, proc.returncode,
+                        cmd=[str(arg) for arg in cmd])
+        record['args']['returncodes'] = codes
+
+    failed = False
+    for (cmd, message), code in zip(stages, codes):
+        if code == 0:
+            continue
+        step = message.strip(' .')
+        if code < 0:
+            print(f'ERROR: {cmd[0]} ({step}) was killed by signal {-code}')
+        else:
+            print(f'ERROR: {cmd[0]} ({step}) failed with exit status {code}')
+        failed = True
+    if failed:
+        sys.exit(1)
 
 
 def _cowsay(message):
@@ -57,49 +124,62 @@ def _cowsay(message):
         print(message)
 
 
-def singledingle(filename):
-    """Single-sided 2-up imposition: PDF -> PS -> psbook -> pstops -> PDF."""
-    base = filename.removesuffix('.pdf')
-
-    print(f'got file {filename}')
-    print('.PSenating ...')
-    _run(['pdftops', '-level3', '-origpagesizes', filename, f'{base}.ps'])
+def singledingle(filename, native=True):
+    """
+    Single-sided 2-up imposition.
 
-    print(' ... rearranging pages ...')
-    _run(['psbook', f'{base}.ps', f'b{base}.ps'])
+    By default the signature is imposed in-process by ppp.impose; with
+    native=False it takes the old PDF -> PS -> psbook -> pstops -> PDF route.
+    """
+    output = _imposed_name(filename)
 
-    print(' ... imposing pages 2-up ...')
-    _run(['pstops', '2:0L@1.0(1w,0)+1L@1.0(1w,0.5h)', f'b{base}.ps', f'i{base}.ps'])
+    print(f'got file {filename}')
+    if native:
+        print(' ... imposing pages 2-up ...')
+        try:
+            with trace.span('impose_2up', inputs=[filename], outputs=[output]):
+                with atomic_output(output) as part:
+                    sides = impose_2up(filename, part)
+        except Exception as e:
+            print(f'ERROR: 2-up imposition failed: {e}')
+            sys.exit(1)
+        print(f'Wrote {sides} pages')
+        _cowsay('and boom goes the dynamite.')
+        return
 
-    print(' ... re.PDFenating ...')
-    _run(['ps2pdf', f'i{base}.ps', f'PPP{base}.pdf'])
+    # pdftops -> psbook -> pstops -> ps2pdf, connected by pipes
+    with atomic_output(output) as part:
+        _pipeline([
+            (['pdftops', '-level3', '-origpagesizes', filename, '-'], '.PSenating ...'),
+            (['psbook'], ' ... rearranging pages ...'),
+            (['pstops', '2:0L@1.0(1w,0)+1L@1.0(1w,0.5h)'], ' ... imposing pages 2-up ...'),
+            (['ps2pdf', '-', part], ' ... re.PDFenating ...'),
+        ], inputs=[filename], outputs=[part])
 
-    _cleanup_ps()
     _cowsay('and boom goes the dynamite.')
 
 
 def singledingle_main():
-    if len(sys.argv) < 2:
-        print('Usage: singledingle <file.pdf>')
+    args = sys.argv[1:]
+    native = '--ps' not in args
+    args = [a for a in args if a != '--ps']
+    if not args:
+        print('Usage: singledingle [--ps] <file.pdf>')
+        print('  --ps   use the external pdftops/psbook/pstops/ps2pdf tool chain')
         sys.exit(1)
-    singledingle(sys.argv[1])
+    singledingle(args[0], native=native)
 
 
 def flippar(filename):
-    """Page flip fixer: PDF -> PS -> pstops -> PDF."""
-    base = filename.removesuffix('.pdf')
-
+    """Page flip fixer: PDF -> PS -> pstops -> PDF, through pipes."""
     print(f'got file {filename}')
-    print('.PSenating ...')
-    _run(['pdftops', '-level3', '-origpagesizes', filename, f'{base}.ps'])
-
-    print(' ... reticulating splines ...')
-    _run(['pstops', '2:0,1U(1w,1h)', f'{base}.ps', f'i{base}.ps'])
+    with atomic_output(_fixed_name(filename)) as part:
+        _pipeline([
+            (['pdftops', '-level3', '-origpagesizes', filename, '-'], '.PSenating ...'),
+            (['pstops', '2:0,1U(1w,1h)'], ' ... reticulating splines ...'),
+            (['ps2pdf', '-', part], ' ... re.PDFenating ...'),
+        ], inputs=[filename], outputs=[part])
 
-    print(' ... re.PDFenating ...')
-    _run(['ps2pdf', f'i{base}.ps', f'{base}-fixed.pdf'])
-
-    _cleanup_ps()
     _cowsay('and boom goes the dynamite.')
 
 
@@ -110,51 +190,217 @@ def flippar_main():
     flippar(sys.argv[1])
 
 
-def fppp_main():
-    """Run singledingle on all PDFs in current directory."""
-    pdf_files = sorted(glob.glob('*.pdf'))
+def _imposed_name(filename):
+    """Where singledingle writes filename's imposed sheets (in the current directory)."""
+    return f'PPP{os.path.basename(filename).removesuffix(".pdf")}.pdf'
+
+
+def _fixed_name(filename):
+    """Where flippar writes filename's fixed pages (in the current directory)."""
+    return f'{os.path.basename(filename).removesuffix(".pdf")}-fixed.pdf'
+
+
+def _is_fixed(filename):
+    """Whether filename is flippar output."""
+    return os.path.basename(filename).endswith('-fixed.pdf')
+
+
+def _is_generated(filename):
+    """Whether filename is singledingle or flippar output rather than a signature."""
+    return os.path.basename(filename).startswith('PPP') or _is_fixed(filename)
+
+
+def _up_to_date(source, output):
+    """Whether output exists and is at least as new as source."""
+    try:
+        return os.path.getmtime(output) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def _captured(func, filename):
+    """
+    Run func(filename) with everything written to stdout and stderr,
+    by Python or by the tools it runs, captured. Meant for pool workers,
+    which have their file descriptors to themselves.
+
+    Returns (succeeded, output, trace spans recorded meanwhile); the spans
+    go back to the parent, since pool workers never write a trace.
+    """
+    trace.take()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    with tempfile.TemporaryFile() as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            func(filename)
+            ok = True
+        except SystemExit as e:
+            ok = not e.code
+        except Exception as e:
+            print(f'ERROR: {e}')
+            ok = False
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            for fd, copy in zip((1, 2), saved):
+                os.dup2(copy, fd)
+                os.close(copy)
+        log.seek(0)
+        return ok, log.read().decode(errors='replace'), trace.take()
+
+
+def _run_directory(func, output_name, is_output, workers=None, force=False):
+    """
+    Run func on every PDF in the current directory, at most workers files
+    at a time (default: number of CPU cores).
+
+    Files is_output() recognises are never inputs, and inputs whose
+    output_name(input) is already newer are skipped unless force is set,
+    so running again only redoes what changed. Each file's output is
+    printed in file order once it is done; every failed file is listed
+    before exiting non-zero.
+    """
+    pdf_files = sorted(f for f in glob.glob('*.pdf') if not is_output(f))
     if not pdf_files:
         print('No PDF files found in current directory.')
         sys.exit(1)
-    for f in pdf_files:
-        singledingle(f)
+
+    todo = [f for f in pdf_files if force or not _up_to_date(f, output_name(f))]
+    if len(todo) < len(pdf_files):
+        print(f'{len(pdf_files) - len(todo)} of {len(pdf_files)} file(s) already up to date.')
+    if not todo:
+        return
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(todo)))
+    print(f'Processing {len(todo)} file(s) ({workers} worker(s))...')
+
+    failures = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for filename, (ok, output, spans) in zip(todo, pool.map(_captured, [func] * len(todo), todo)):
+            trace.adopt(spans)
+            print(output, end='' if output.endswith('\n') or not output else '\n')
+            if not ok:
+                failures.append(filename)
+
+    if failures:
+        print(f'ERROR: {len(failures)} of {len(todo)} file(s) failed:')
+        for filename in failures:
+            print(f'  {filename}')
+        sys.exit(1)
+
+
+def _directory_parser(prog, description):
+    parser = argparse.ArgumentParser(prog=prog, description=description)
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='files to process at once (default: number of CPU cores)')
+    parser.add_argument('--force', action='store_true',
+                        help='redo files whose output is already newer than they are')
+    return parser
+
+
+def fppp_main():
+    """Run singledingle on all PDFs in current directory."""
+    parser = _directory_parser('fppp', 'Run singledingle on every PDF in the current directory.')
+    parser.add_argument('--ps', action='store_true',
+                        help='use the external pdftops/psbook/pstops/ps2pdf tool chain')
+    args = parser.parse_args()
+    func = functools.partial(singledingle, native=False) if args.ps else singledingle
+    _run_directory(func, _imposed_name, _is_generated, args.workers, args.force)
 
 
 def pppf_main():
     """Run flippar on all PDFs in current directory."""
-    pdf_files = sorted(glob.glob('*.pdf'))
-    if not pdf_files:
-        print('No PDF files found in current directory.')
-        sys.exit(1)
-    for f in pdf_files:
-        flippar(f)
+    parser = _directory_parser('pppf', 'Run flippar on every PDF in the current directory.')
+    args = parser.parse_args()
+    # Imposed PPP*.pdf sheets are just what flippar is for
+    _run_directory(flippar, _fixed_name, _is_fixed, args.workers, args.force)
 
 
-def impose_4up(filename):
-    """4-up imposition: PDF -> PS -> pstops -> PDF."""
-    base = filename.removesuffix('.pdf')
+def impose(filename, nup, scheme='sheetwise', sheet_size=LETTER, nested=True):
+    """n-up imposition in-process by ppp.impose, to PPP<name>.pdf."""
+    output = _imposed_name(filename)
 
     print(f'got file {filename}')
-    print('.PSenating ...')
-    _run(['pdftops', '-level3', '-origpagesizes', filename, f'{base}.ps'])
+    print(f' ... imposing pages {nup}-up ({scheme}) ...')
+    try:
+        with trace.span(f'impose_{nup}up', inputs=[filename], outputs=[output], scheme=scheme):
+            with atomic_output(output) as part:
+                sides = impose_nup(filename, part, nup, scheme, sheet_size, nested)
+    except Exception as e:
+        print(f'ERROR: {nup}-up imposition failed: {e}')
+        sys.exit(1)
+    print(f'Wrote {sides} pages; print double-sided, flip {flip_edge(nup, scheme, sheet_size)} edge')
+    _cowsay('and boom goes the dynamite.')
+
+
+def impose_4up(filename, native=True):
+    """
+    4-up imposition, each sheet folding into its own 8-page section.
 
-    print(' ... imposing pages 4-up ...')
-    _run(['pstops',
-          '4:0U(0,0)+7U(0.5w,0)+3(0,0.5h)+4(0.5w,0.5h), 4:6U(0,0)+1U(0.5w,0)+5(0,0.5h)+2(0.5w,0.5h)',
-          f'{base}.ps', f'i{base}.ps'])
+    By default the sheets are imposed in-process; with native=False it
+    takes the old PDF -> PS -> pstops -> PDF route.
+    """
+    if native:
+        impose(filename, 4, nested=False)
+        return
 
-    print(' ... re.PDFenating ...')
-    _run(['ps2pdf', f'i{base}.ps', f'PPP{base}.pdf'])
+    print(f'got file {filename}')
+    with atomic_output(_imposed_name(filename)) as part:
+        _pipeline([
+            (['pdftops', '-level3', '-origpagesizes', filename, '-'], '.PSenating ...'),
+            (['pstops',
+              '4:0U(0,0)+7U(0.5w,0)+3(0,0.5h)+4(0.5w,0.5h), 4:6U(0,0)+1U(0.5w,0)+5(0,0.5h)+2(0.5w,0.5h)'],
+             ' ... imposing pages 4-up ...'),
+            (['ps2pdf', '-', part], ' ... re.PDFenating ...'),
+        ], inputs=[filename], outputs=[part])
 
-    _cleanup_ps()
     _cowsay('and boom goes the dynamite.')
 
 
 def impose_4up_main():
-    if len(sys.argv) < 2:
-        print('Usage: impose-4up <file.pdf>')
+    args = sys.argv[1:]
+    native = '--ps' not in args
+    args = [a for a in args if a != '--ps']
+    if not args:
+        print('Usage: impose-4up [--ps] <file.pdf>')
+        print('  --ps   use the external pdftops/pstops/ps2pdf tool chain')
         sys.exit(1)
-    impose_4up(sys.argv[1])
+    impose_4up(args[0], native=native)
+
+
+def _sheet_size(text):
+    """A SHEET_SIZES name or WIDTHxHEIGHT in points."""
+    if text.lower() in SHEET_SIZES:
+        return SHEET_SIZES[text.lower()]
+    try:
+        width, height = (float(v) for v in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f'expected one of {", ".join(SHEET_SIZES)} or WIDTHxHEIGHT in points')
+    return width, height
+
+
+def impose_nup_main():
+    parser = argparse.ArgumentParser(
+        prog='impose-nup',
+        description='Impose a signature 2-, 4-, 8- or 16-up onto PPP<file>.pdf.')
+    parser.add_argument('file', help='signature PDF')
+    parser.add_argument('-n', '--nup', type=int, default=4, choices=(2, 4, 8, 16),
+                        help='pages on each side of a sheet (default: 4)')
+    parser.add_argument('--scheme', default='sheetwise', choices=SCHEMES,
+                        help='sheetwise: separate front and back; work-and-turn: one '
+                             'layout on both sides, cut into two copies (default: sheetwise)')
+    parser.add_argument('--sheet', type=_sheet_size, default=LETTER, metavar='SIZE',
+                        help=f'{", ".join(SHEET_SIZES)} or WIDTHxHEIGHT in points (default: letter)')
+    parser.add_argument('--stacked', action='store_true',
+                        help='fold each sheet on its own instead of nesting them into one signature')
+    args = parser.parse_args()
+    impose(args.file, args.nup, args.scheme, args.sheet, nested=not args.stacked)
 
 
 def isbnner_main():
@@ -0,0 +1,62 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+Single-pass signature splitter.
+Parses the source PDF once and writes every signature from the same
+reader, so fonts and images shared between signatures are only parsed
+once no matter how many signatures the book is cut into.
+"""
+
+import PyPDF2
+
+
+def signature_ranges(sig_sizes):
+    """
+    Convert a list of signature sizes into 1-based inclusive page ranges.
+
+    Example: [32, 32, 28] -> [(1, 32), (33, 64), (65, 92)]
+    """
+    ranges = []
+    first = 1
+    for size in sig_sizes:
+        ranges.append((first, first + size - 1))
+        first += size
+    return ranges
+
+
+def split_pdf(source_file, ranges, output_files, progress=None):
+    """
+    Write each page range of source_file to the matching output file.
+
+    Args:
+        source_file: Input PDF filename
+        ranges: List of (first, last) 1-based inclusive page ranges
+        output_files: List of output filenames, one per range
+        progress: Optional callable(output_file, page_count) called after
+            each file is written
+    """
+    if len(ranges) != len(output_files):
+        raise ValueError(f'{len(ranges)} ranges but {len(output_files)} output files')
+
+    with open(source_file, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        page_count = len(reader.pages)
+
+        for (first, last), output_file in zip(ranges, output_files):
+            if not 1 <= first <= last <= page_count:
+                raise ValueError(f'Page range {first}-{last} is outside 1-{page_count}')
+
+            writer = PyPDF2.PdfWriter()
+            for index in range(first - 1, last):
+                writer.add_page(reader.pages[index])
+            with open(output_file, 'wb') as out:
+                writer.write(out)
+
+            if progress is not None:
+                progress(output_file, last - first + 1)
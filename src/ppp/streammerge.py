@@ -0,0 +1,210 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+Bounded-memory PDF merge.
+The inputs are copied into the output one at a time: each input's pages
+and the objects they use are renumbered and written straight to the
+output file as they are read, and the input is closed before the next
+one is opened. Memory depends on the biggest single input, not on how
+many there are; the only thing that grows with the merge is the
+cross-reference table, one offset per object written.
+
+Only the pages come across: outlines, forms and other document-level
+data of the inputs are dropped, as in a plain page concatenation.
+"""
+
+import os
+from array import array
+
+import PyPDF2
+
+from ppp._rawpdf import Name, RawPdf, RawPdfError, Ref, Stream, serialize
+from ppp._util import atomic_output, scratch_dir
+
+_INHERITABLE = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+CATALOG = 1
+PAGES = 2
+
+
+class _Output:
+    """The merged file as it is written: where each object went, and the pages."""
+
+    def __init__(self, f):
+        self.f = f
+        # Indexed by object number; 0 means not (or not yet) written
+        self.offsets = array('Q', [0, 0, 0])
+        self.kids = array('Q')
+        f.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+
+    def new_number(self):
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+
+    def write(self, num, value):
+        self.offsets[num] = self.f.tell()
+        if isinstance(value, Stream):
+            self.f.write(b'%d 0 obj\n' % num + serialize(value.dict) + b'\nstream\n')
+            self.f.write(value.raw)
+            self.f.write(b'\nendstream\nendobj\n')
+        else:
+            self.f.write(b'%d 0 obj\n' % num + serialize(value) + b'\nendobj\n')
+
+    def finish(self):
+        """Write the page tree root, catalog, cross-reference table and trailer."""
+        f = self.f
+        self.offsets[PAGES] = f.tell()
+        f.write(b'%d 0 obj\n<</Type /Pages /Count %d /Kids [' % (PAGES, len(self.kids)))
+        for i in range(0, len(self.kids), 1000):
+            f.write(b''.join(b'%d 0 R\n' % num for num in self.kids[i:i + 1000]))
+        f.write(b']>>\nendobj\n')
+        self.offsets[CATALOG] = f.tell()
+        f.write(b'%d 0 obj\n<</Type /Catalog /Pages %d 0 R>>\nendobj\n' % (CATALOG, PAGES))
+
+        xref = f.tell()
+        f.write(b'xref\n0 %d\n0000000000 65535 f\r\n' % len(self.offsets))
+        for i in range(1, len(self.offsets), 1000):
+            f.write(b''.join(b'%010d 00000 n\r\n' % offset if offset else b'0000000000 00000 f\r\n'
+                             for offset in self.offsets[i:i + 1000]))
+        f.write(b'trailer\n<</Size %d /Root %d 0 R>>\nstartxref\n%d\n%%%%EOF\n'
+                % (len(self.offsets), CATALOG, xref))
+
+
+def _page_tree(pdf):
+    """
+    The leaves of pdf's page tree in order, as (reference, inherited
+    attributes), and the object numbers of its inner nodes.
+    """
+    catalog = pdf.resolve(pdf.trailer.get('/Root'))
+    root = catalog.get('/Pages') if isinstance(catalog, dict) else None
+    if not isinstance(root, Ref):
+        raise RawPdfError('page tree root is not an indirect object')
+
+    leaves, nodes = [], set()
+    stack = [(root, {})]
+    while stack:
+        ref, inherited = stack.pop()
+        node = pdf.resolve(ref)
+        if not isinstance(node, dict):
+            raise RawPdfError('bad page tree node')
+        if '/Kids' not in node:
+            leaves.append((ref, inherited))
+            continue
+        if ref.num in nodes or len(nodes) > 1_000_000:
+            raise RawPdfError('page tree has a cycle')
+        nodes.add(ref.num)
+        inherited = dict(inherited)
+        inherited.update((key, node[key]) for key in _INHERITABLE if key in node)
+        kids = pdf.resolve(node['/Kids'])
+        if not isinstance(kids, list) or not all(isinstance(kid, Ref) for kid in kids):
+            raise RawPdfError('page tree kids are not indirect objects')
+        stack.extend((kid, inherited) for kid in reversed(kids))
+    return leaves, nodes
+
+
+def _copy_pages(pdf, out):
+    """
+    Write pdf's pages, and every object they use, to out.
+    Returns the new object numbers of the pages, in order.
+    """
+    if '/Encrypt' in pdf.trailer:
+        raise RawPdfError('document is encrypted')
+    leaves, nodes = _page_tree(pdf)
+
+    # Pages get their numbers up front so references between them (links,
+    # annotations) resolve to the rewritten pages; every reference to an
+    # inner node of the old tree becomes one to the new root.
+    mapping = {num: PAGES for num in nodes}
+    for ref, _ in leaves:
+        mapping[ref.num] = out.new_number()
+    pending = []
+
+    def renumber(value):
+        if isinstance(value, Ref):
+            num = mapping.get(value.num)
+            if num is None:
+                num = mapping[value.num] = out.new_number()
+                pending.append(value.num)
+            return Ref(num, 0)
+        if isinstance(value, dict):
+            return {key: renumber(v) for key, v in value.items()}
+        if isinstance(value, list):
+            return [renumber(v) for v in value]
+        if isinstance(value, Stream):
+            return Stream(renumber(value.dict), value.raw)
+        return value
+
+    pages = []
+    for ref, inherited in leaves:
+        page = dict(pdf.get(ref.num, cache=False))
+        for key, value in inherited.items():
+            page.setdefault(key, value)
+        page[Name('/Parent')] = Ref(PAGES, 0)
+        num = mapping[ref.num]
+        out.write(num, renumber(page))
+        pages.append(num)
+
+        # Copy what the page uses before moving on, so nothing piles up
+        while pending:
+            old = pending.pop()
+            out.write(mapping[old], renumber(pdf.get(old, cache=False)))
+    return pages
+
+
+def _rewritten(path, scratch):
+    """
+    A plain copy of path written by PyPDF2, for inputs the streaming
+    reader cannot handle (damaged, encrypted with an empty password, or
+    using filters it does not know).
+    """
+    reader = PyPDF2.PdfReader(path)
+    if reader.is_encrypted and not reader.decrypt(''):
+        raise RawPdfError(f'{path} is encrypted')
+    writer = PyPDF2.PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    copy = os.path.join(scratch, 'rewritten.pdf')
+    with open(copy, 'wb') as f:
+        writer.write(f)
+    return copy
+
+
+def stream_merge(inputs, output_file, delete=False, progress=None):
+    """
+    Concatenate the pages of inputs into output_file, one input at a time.
+
+    Inputs the streaming reader cannot parse are first rewritten by
+    PyPDF2 (which holds that one input in memory). The output is written
+    under a temporary name and renamed into place when complete. With
+    delete set the inputs are removed afterwards. progress, if given, is
+    called as progress(input, page_count) after each input is copied.
+
+    Returns the number of pages written.
+    """
+    with atomic_output(output_file) as part, open(part, 'wb') as f:
+        out = _Output(f)
+        for path in inputs:
+            try:
+                with RawPdf(path) as pdf:
+                    pages = _copy_pages(pdf, out)
+            except RawPdfError:
+                # Objects already copied from it stay behind, unreferenced
+                with scratch_dir('merge-') as scratch:
+                    with RawPdf(_rewritten(path, scratch)) as pdf:
+                        pages = _copy_pages(pdf, out)
+            out.kids.extend(pages)
+            if progress is not None:
+                progress(path, len(pages))
+        out.finish()
+        page_count = len(out.kids)
+
+    if delete:
+        for path in inputs:
+            os.remove(path)
+    return page_count
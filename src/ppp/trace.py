@@ -0,0 +1,287 @@
+#		        This program is part of
+#          Paul's Preponderating Prepresser v1.1
+#            (CC-BY-SA) 2025 era vulgaris, by
+#        The Rev. Paul T. Fusco-Gessick, J.D., SDA
+#                <<paul@neroots.net>>
+
+#                I.F.E.T.  --  I.V.V.S.
+
+"""
+Opt-in tracing of workflow stages and external commands.
+Turn it on with `ppp --trace FILE` or PPP_TRACE=FILE (which also works
+for singledingle, flippar and the other shell tools). Every stage and
+every command run through trace.run() becomes a span with wall and CPU
+time, the rusage of the child processes it waited for and the bytes it
+read and wrote. The trace is written when the program exits: as JSON
+lines if FILE ends in .jsonl, otherwise in Chrome trace format (open it
+in chrome://tracing or ui.perfetto.dev).
+
+Work done inside the workflow's worker processes shows up in the span of
+the stage that started it, not as spans of its own; fppp and pppf hand
+their workers' spans back to be written with the rest (see take() and
+adopt()). children_peak_rss_bytes is the biggest child process waited for
+so far, not just during the span; only spans from child() have a
+child_maxrss_bytes of their own.
+"""
+
+import atexit
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_state = {'path': None, 'spans': [], 'next_id': 1}
+_lock = threading.Lock()
+_local = threading.local()
+_epoch = time.perf_counter()
+
+
+def configure(path):
+    """Start tracing; the trace is written to path when the program exits."""
+    if _state['path'] is None:
+        atexit.register(save)
+    _state['path'] = os.path.abspath(path)
+
+
+def enabled():
+    return _state['path'] is not None
+
+
+def spans():
+    """The finished spans so far, oldest first."""
+    with _lock:
+        return list(_state['spans'])
+
+
+def take():
+    """Remove and return the finished spans so far (for a worker to hand back)."""
+    with _lock:
+        records, _state['spans'] = _state['spans'], []
+    return records
+
+
+def adopt(records):
+    """
+    Add spans recorded in another process (see take()), nested under the
+    innermost open span here. They are given new ids, since every forked
+    worker numbers its spans from the same point.
+    """
+    if not enabled() or not records:
+        return
+    stack = getattr(_local, 'stack', None)
+    outer = stack[-1] if stack else None
+    with _lock:
+        ids = {}
+        for record in records:
+            ids[record['id']] = _state['next_id']
+            _state['next_id'] += 1
+        for record in records:
+            record = dict(record, id=ids[record['id']])
+            record['parent'] = ids.get(record['parent'], outer)
+            _state['spans'].append(record)
+
+
+def _maxrss_bytes(usage):
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def peak_rss():
+    """
+    Peak resident set size so far, in bytes: (this process, the largest
+    child process waited for).
+    """
+    return (_maxrss_bytes(resource.getrusage(resource.RUSAGE_SELF)),
+            _maxrss_bytes(resource.getrusage(resource.RUSAGE_CHILDREN)))
+
+
+def _size(paths):
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+@contextmanager
+def span(name, category='stage', inputs=(), outputs=(), **args):
+    """
+    Record the enclosed block as a span.
+
+    inputs and outputs are file paths whose sizes count as bytes in and
+    out; outputs are measured when the block ends. Yields a dict the block
+    may add to: more paths to its 'outputs' list, or entries to 'args'.
+    When tracing is off this costs next to nothing.
+    """
+    record = {'outputs': list(outputs), 'args': dict(args)}
+    if not enabled():
+        yield record
+        return
+
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    with _lock:
+        span_id = _state['next_id']
+        _state['next_id'] += 1
+    parent = stack[-1] if stack else None
+    stack.append(span_id)
+
+    bytes_in = _size(inputs)
+    own0 = resource.getrusage(resource.RUSAGE_SELF)
+    child0 = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield record
+    except BaseException as e:
+        status = 'exit' if isinstance(e, SystemExit) else 'error'
+        record['args'].setdefault('error', f'{type(e).__name__}: {e}')
+        raise
+    finally:
+        wall = time.perf_counter() - start
+        own1 = resource.getrusage(resource.RUSAGE_SELF)
+        child1 = resource.getrusage(resource.RUSAGE_CHILDREN)
+        stack.pop()
+        finished = {
+            'id': span_id,
+            'parent': parent,
+            'name': name,
+            'category': category,
+            'status': status,
+            'start_s': round(start - _epoch, 6),
+            'wall_s': round(wall, 6),
+            # Process-wide: includes other threads busy at the same time
+            'cpu_s': round(own1.ru_utime - own0.ru_utime + own1.ru_stime - own0.ru_stime, 6),
+            'child_user_s': round(child1.ru_utime - child0.ru_utime, 6),
+            'child_sys_s': round(child1.ru_stime - child0.ru_stime, 6),
+            # A running peak: ru_maxrss of RUSAGE_CHILDREN cannot be split by span
+            'children_peak_rss_bytes': _maxrss_bytes(child1),
+            'bytes_in': bytes_in,
+            'bytes_out': _size(record['outputs']),
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': record['args'],
+        }
+        with _lock:
+            _state['spans'].append(finished)
+
+
+def run(cmd, inputs=None, outputs=None, **kwargs):
+    """
+    subprocess.run(cmd, **kwargs), traced as a 'command' span.
+
+    Unless given, inputs are the arguments naming files that exist before
+    the command runs and outputs those that exist afterwards but are not
+    inputs (relative to the cwd keyword, if any).
+    """
+    if not enabled():
+        return subprocess.run(cmd, **kwargs)
+
+    def as_path(arg):
+        return os.path.join(kwargs.get('cwd') or '.', arg)
+
+    args = [str(arg) for arg in cmd[1:]]
+    if inputs is None:
+        inputs = [as_path(arg) for arg in args if os.path.isfile(as_path(arg))]
+    with span(os.path.basename(str(cmd[0])), 'command', inputs=inputs,
+              cmd=[str(arg) for arg in cmd]) as record:
+        try:
+            result = subprocess.run(cmd, **kwargs)
+        finally:
+            if outputs is None:
+                outputs = [as_path(arg) for arg in args
+                           if as_path(arg) not in inputs and os.path.isfile(as_path(arg))]
+            record['outputs'].extend(outputs)
+        record['args']['returncode'] = result.returncode
+    return result
+
+
+def child(name, start, usage, returncode, **args):
+    """
+    Record a 'command' span for a child process already reaped with
+    os.wait4(), nested under the innermost open span. start is when it was
+    started (time.perf_counter()) and usage the rusage wait4 returned, so
+    children that ran at the same time each get their own figures; the
+    span ends now.
+    """
+    if not enabled():
+        return
+    stack = getattr(_local, 'stack', None)
+    with _lock:
+        span_id = _state['next_id']
+        _state['next_id'] += 1
+    args['returncode'] = returncode
+    finished = {
+        'id': span_id,
+        'parent': stack[-1] if stack else None,
+        'name': name,
+        'category': 'command',
+        'status': 'ok' if returncode == 0 else 'error',
+        'start_s': round(start - _epoch, 6),
+        'wall_s': round(time.perf_counter() - start, 6),
+        'cpu_s': 0.0,
+        'child_user_s': round(usage.ru_utime, 6),
+        'child_sys_s': round(usage.ru_stime, 6),
+        'child_maxrss_bytes': _maxrss_bytes(usage),
+        'bytes_in': 0,
+        'bytes_out': 0,
+        'pid': os.getpid(),
+        'tid': threading.get_ident(),
+        'args': args,
+    }
+    with _lock:
+        _state['spans'].append(finished)
+
+
+def write_jsonl(path, records=None):
+    """Write spans as JSON lines, one span per line."""
+    with open(path, 'w') as f:
+        for record in spans() if records is None else records:
+            f.write(json.dumps(record) + '\n')
+
+
+def write_chrome(path, records=None):
+    """Write spans in Chrome trace event format (complete 'X' events)."""
+    events = []
+    for record in spans() if records is None else records:
+        args = {key: value for key, value in record.items()
+                if key not in ('name', 'category', 'start_s', 'wall_s', 'pid', 'tid', 'args')}
+        args.update(record['args'])
+        events.append({
+            'name': record['name'],
+            'cat': record['category'],
+            'ph': 'X',
+            'ts': round(record['start_s'] * 1e6, 1),
+            'dur': round(record['wall_s'] * 1e6, 1),
+            'pid': record['pid'],
+            'tid': record['tid'],
+            'args': args,
+        })
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        f.write('\n')
+
+
+def save(path=None):
+    """Write the trace to path (default: the configured one), by extension."""
+    path = path or _state['path']
+    if path is None:
+        return
+    try:
+        if path.endswith('.jsonl'):
+            write_jsonl(path)
+        else:
+            write_chrome(path)
+    except OSError as e:
+        print(f'WARNING: Could not write trace to {path}: {e}')
+
+
+if os.environ.get('PPP_TRACE'):
+    configure(os.environ['PPP_TRACE'])
@@ -12,181 +12,79 @@ Main workflow orchestrator for PDF signature preparation and imposition.
 Automates the complete process from source PDF to print-ready signatures.
 """
 
+import argparse
+import functools
+import gc
+import json
+import math
+import re
 import sys
 import os
 import subprocess
-import PyPDF2
 import shutil
-
-from ppp._util import get_data_path
-
-VALID_SIG_SIZES = [4, 8, 12, 16, 20, 24, 28, 32, 36, 40, 44, 48]
-SIG_TABLES = {
-    4: (1,4,5,8,9,12,13,16,17,20,21,24,25,28,29,32,33,36,37,40,41,44,45,48,49,52,53,56,57,60,61,64,65,68,69,72,73,76,77,80,81,84,85,88,89,92,93,96,97,100,101,104,105,108,109,112,113,116,117,120),
-    8: (1,8,9,16,17,24,25,32,33,40,41,48,49,56,57,64,65,72,73,80,81,88,89,96,97,104,105,112,113,120,121,128,129,136,137,144,145,152,153,160,161,168,169,176,177,184,185,192,193,200,201,208,209,216,217,224,225,232,233,240),
-    12: (1,12,13,24,25,36,37,48,49,60,61,72,73,84,85,96,97,108,109,120,121,132,133,144,145,156,157,168,169,180,181,192,193,204,205,216,217,228,229,240,241,252,253,264,265,276,277,288,289,300,301,312,313,324,325,336,337,348,349,360),
-    16: (1,16,17,32,33,48,49,64,65,80,81,96,97,112,113,128,129,144,145,160,161,176,177,192,193,208,209,224,225,240,241,256,257,272,273,288,289,304,305,320,321,336,337,352,353,368,369,384,385,400,401,416,417,432,433,448,449,465,480),
-    20: (1,20,21,40,41,60,61,80,81,100,101,120,121,140,141,160,161,180,181,200,201,220,221,240,241,260,261,280,281,300,301,320,321,340,341,360,361,380,381,400,401,420,421,440,441,460,461,480,481,500,501,520,521,540,541,560,561,580,581,600),
-    24: (1,24,25,48,49,72,73,96,97,120,121,144,145,168,169,192,193,216,217,240,241,264,265,288,289,312,313,336,337,360,361,384,385,408,409,432,433,456,457,480,481,504,505,528,529,552,553,576,577,600,601,624,625,648,649,672,673,696,697,720,721,744,745,768,769,792,793,816,817,840,841,864,865,888,889,912,913,936,937,960),
-    28: (1,28,29,56,57,84,85,112,113,140,141,168,169,196,197,224,225,252,253,280,281,308,309,336,337,364,365,392,393,420,421,448,449,476,477,504,505,532,533,560,561,588,589,616,617,644,645,672,673,700,701,728,729,756,757,784,785,812,813,840,841,868,869,896,897,924,925,952,953,980,981,1008,1009,1036,1037,1064,1065,1092,1093,1120),
-    32: (1,32,33,64,65,96,97,128,129,160,161,192,193,224,225,256,257,288,289,320,321,352,353,384,385,416,417,448,449,480,481,512,513,544,545,576,577,608,609,640,641,672,673,704,705,736,737,768,769,800,801,832,833,864,865,896,897,928,929,960,961,992,993,1024,1025,1056,1057,1088,1089,1120,1121,1152,1153,1184,1185,1216,1217,1248,1249,1280,1281,1312,1313,1344,1345,1376,1377,1408,1409,1440,1441,1472,1473,1504,1505,1536,1537,1568,1569,1600),
-    36: (1,36,37,72,73,108,109,144,145,180,181,216,217,252,253,288,289,324,325,360,361,396,397,432,433,468,469,504,505,540,541,576,577,612,613,648,649,684,685,720,721,756,757,792,793,828,829,864,865,900,901,936,937,972,973,1008,1009,1044,1045,1080,1081,1116,1117,1152,1153,1188,1189,1224,1225,1260,1261,1296,1297,1332,1333,1368,1369,1404,1405,1440,1441,1476,1477,1512,1513,1548,1549,1584,1585,1620,1621,1656,1657,1692,1693,1728,1729,1764,1765,1800),
-    40: (1,40,41,80,81,120,121,160,161,200,201,240,241,280,281,320,321,360,361,400,401,440,441,480,481,520,521,560,561,600,601,640,641,680,681,720,721,760,761,800,801,840,841,880,881,920,921,960,961,1000,1001,1040,1041,1080,1081,1120,1121,1160,1161,1200,1201,1240,1241,1280,1281,1320,1321,1360,1361,1400,1401,1440,1441,1480,1481,1520,1521,1560,1561,1600),
-    44: (1,44,45,88,89,132,133,176,177,220,221,264,265,308,309,352,353,396,397,440,441,484,485,528,529,572,573,616,617,660,661,704,705,748,749,792,793,836,837,880,881,924,925,968,969,1012,1013,1056,1057,1100,1101,1144,1145,1188,1189,1232,1233,1276,1277,1320,1321,1364,1365,1408,1409,1452,1453,1496,1497,1540,1541,1584,1585,1628,1629,1672,1673,1716,1717,1760),
-    48: (1,48,49,96,97,144,145,192,193,240,241,288,289,336,337,384,385,432,433,480,481,528,529,576,577,624,625,672,673,720,721,768,769,816,817,864,865,912,913,960,961,1008,1009,1056,1057,1104,1105,1152,1153,1200,1201,1248,1249,1296,1297,1344,1345,1392,1393,1440,1441,1488,1489,1536,1537,1584,1585,1632,1633,1680,1681,1728,1729,1776,1777,1824,1825,1872,1873,1920)
-}
-
-def get_page_count(filename):
-    """Get page count from a PDF file."""
-    try:
-        with open(filename, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            return len(reader.pages)
-    except Exception as e:
-        print(f'ERROR: Could not read PDF file: {e}')
-        return None
-
-def suggest_signature_sizes(page_count):
+from concurrent.futures import ProcessPoolExecutor
+
+from ppp import api, cache, manifest, pageplan, trace
+from ppp._util import make_scratch_dir
+from ppp.impose import LETTER
+from ppp.planner import VALID_SIG_SIZES, parse_sig_sizes, plan_signatures
+from ppp.probe import ProbeError, enable_persistent_cache, get_page_count, probe
+from ppp.split import signature_ranges, split_pdf
+from ppp.streammerge import stream_merge
+
+# Exit codes, so schedulers can tell outcomes apart (see ppp --help)
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_INPUT = 3
+EXIT_NO_PLAN = 4
+EXIT_SKIPPED = 5
+EXIT_NEEDS_INPUT = 6
+
+HALF_LETTER = (396, 612)  # 5.5 x 8.5 in, in points
+PAGES_PER_COMBINED = 200  # Keep print jobs small enough for office printers
+
+def suggest_signature_sizes(page_count, limit=5):
     """
-    Suggest optimal signature sizes for a given page count.
-    Prefers 32 and 36 page signatures. Never suggests adding >8 blank pages.
-    For large padding needs, suggests mixed signature sizes instead.
+    Suggest signature sizes for a given page count.
+    Delegates to ppp.planner, which searches mixed sizes and ranks the
+    Pareto-optimal plans; 32 and 36 page signatures are preferred and no
+    plan adds more than 8 blank pages.
 
     Returns list of tuples: (description, sig_sizes_list, pages_to_add)
     where sig_sizes_list is a list of signature sizes (e.g., [32, 32, 32, 28])
     """
-    MAX_PADDING = 8
-    PREFERRED_SIZES = [32, 36]  # Preferred for stapling
-    MAX_SIGNATURES = 40  # Don't suggest absurd numbers of signatures
-    MIN_SIG_SIZE = 16 if page_count > 100 else 8  # Use larger sigs for larger docs
-
-    suggestions = []
+    plans = plan_signatures(page_count, limit=limit)
+    return [(plan.description, plan.sig_sizes, plan.blank_pages) for plan in plans]
 
-    # Try preferred sizes first
-    for size in PREFERRED_SIZES:
-        full_sigs = page_count // size
-        remainder = page_count % size
-
-        if remainder == 0:
-            # Perfect fit
-            desc = f'{full_sigs} × {size}-page signatures'
-            sig_config = [size] * full_sigs
-            suggestions.append((desc, sig_config, 0))
-        else:
-            # Option A: Pad to make all signatures the same size (if padding <= 8)
-            pages_to_add = size - remainder
-            if pages_to_add <= MAX_PADDING:
-                desc = f'{full_sigs + 1} × {size}-page signatures'
-                sig_config = [size] * (full_sigs + 1)
-                suggestions.append((desc, sig_config, pages_to_add))
-
-            # Option B: Use smaller final signature
-            # Find best-fitting smaller size for the remainder
-            for final_size in reversed([s for s in VALID_SIG_SIZES if s < size]):
-                if remainder <= final_size:
-                    final_padding = final_size - remainder
-                    if final_padding <= MAX_PADDING:
-                        desc = f'{full_sigs} × {size}-page + 1 × {final_size}-page'
-                        sig_config = [size] * full_sigs + [final_size]
-                        suggestions.append((desc, sig_config, final_padding))
-                        break  # Take the first (largest) that fits
-
-    # Also try other sizes (non-preferred) as fallback
-    for size in [s for s in VALID_SIG_SIZES if s not in PREFERRED_SIZES and s >= MIN_SIG_SIZE]:
-        full_sigs = page_count // size
-        remainder = page_count % size
-
-        # Skip if it would result in too many signatures
-        if full_sigs > MAX_SIGNATURES:
-            continue
+def pad_pdf(source_file, pages_to_add, workdir=None):
+    """
+    Pad a PDF with blank pages the size of its last page.
 
-        if remainder == 0:
-            desc = f'{full_sigs} × {size}-page signatures'
-            sig_config = [size] * full_sigs
-            suggestions.append((desc, sig_config, 0))
-        else:
-            pages_to_add = size - remainder
-            if pages_to_add <= MAX_PADDING and (full_sigs + 1) <= MAX_SIGNATURES:
-                desc = f'{full_sigs + 1} × {size}-page signatures'
-                sig_config = [size] * (full_sigs + 1)
-                suggestions.append((desc, sig_config, pages_to_add))
-
-    # Sort by: 1) least padding, 2) fewest total signatures
-    # Remove duplicates by signature configuration
-    seen_configs = set()
-    unique_suggestions = []
-    for desc, sig_config, padding in suggestions:
-        config_key = tuple(sig_config)
-        if config_key not in seen_configs:
-            seen_configs.add(config_key)
-            unique_suggestions.append((desc, sig_config, padding))
-
-    unique_suggestions.sort(key=lambda x: (x[2], len(x[1])))  # Sort by padding, then num signatures
-
-    return unique_suggestions[:5]  # Return top 5
-
-def pad_pdf(source_file, pages_to_add):
-    """Pad a PDF with blank pages, combining padding files if needed."""
-
-    def find_padding_file(filename):
-        """Look for a padding file in cwd and package data."""
-        return get_data_path(filename)
-
-    # Try to find exact padding file first
-    exact_file = f'{pages_to_add}pp.pdf'
-    exact_path = find_padding_file(exact_file)
-
-    if exact_path:
-        # Exact file exists, use it
-        padding_files = [exact_path]
-    else:
-        # Build padding from available files (1pp.pdf, 2pp.pdf, 3pp.pdf)
-        # Greedy algorithm: use largest files first
-        available = [(3, '3pp.pdf'), (2, '2pp.pdf'), (1, '1pp.pdf')]
-        padding_files = []
-        remaining = pages_to_add
-
-        for size, filename in available:
-            while remaining >= size:
-                path = find_padding_file(filename)
-                if not path:
-                    print(f'ERROR: Cannot create {pages_to_add} blank pages - missing {filename}')
-                    return None
-                padding_files.append(path)
-                remaining -= size
-
-        if remaining > 0:
-            print(f'ERROR: Cannot create {pages_to_add} blank pages with available padding files')
-            return None
-
-    # Create padded filename
+    The padded copy is written next to the source, or into workdir if given.
+    The blank pages are made in-process and share one /MediaBox and
+    /Resources; the workflow itself pads its page plan instead (see
+    pageplan.pad) and never writes a padded copy.
+    """
     base, ext = os.path.splitext(source_file)
     output_file = f'{base}-padded{ext}'
+    if workdir is not None:
+        output_file = os.path.join(workdir, os.path.basename(output_file))
 
-    # Run pdftk with all necessary padding files
     print(f'Adding {pages_to_add} blank page(s)...')
     try:
-        # Build pdftk command: A=source, B=pad1, C=pad2, etc.
-        cmd = ['pdftk', f'A={source_file}']
-        labels = []
-        for i, pad_file in enumerate(padding_files):
-            label = chr(66 + i)  # B, C, D, E, ...
-            cmd.append(f'{label}={pad_file}')
-            labels.append(label)
-
-        # Cat: A B C D ... output
-        cmd.extend(['cat', 'A'] + labels + ['output', output_file])
-
-        subprocess.run(cmd, check=True, capture_output=True)
-        print(f'Created {output_file}')
-        return output_file
-    except subprocess.CalledProcessError as e:
-        print(f'ERROR: pdftk failed')
+        pages = pageplan.source_pages(source_file)
+        size = pageplan.last_page_size(source_file)
+        pageplan.write_pdf(pageplan.pad(pages, pages_to_add, size), output_file)
+    except Exception as e:
+        print(f'ERROR: Could not pad {source_file}: {e}')
         return None
+    print(f'Created {output_file}')
+    return output_file
 
-def split_into_signatures(source_file, sig_sizes):
+def split_into_signatures(source_file, sig_sizes, workdir='.'):
     """
-    Split PDF into signature files.
+    Split PDF into signature files (sig01.pdf, sig02.pdf, ...) in workdir.
     sig_sizes can be either:
     - A single integer (uniform signatures)
     - A list of integers (mixed signature sizes)
@@ -207,136 +105,83 @@ def split_into_signatures(source_file, sig_sizes):
 
     print(f'\nSplitting {source_file} into {len(sig_sizes)} signature(s)...')
 
-    current_page = 1
-    for i, sig_size in enumerate(sig_sizes, 1):
-        end_page = current_page + sig_size - 1
-        pagenums = f'{current_page}-{end_page}'
-        outputnum = f'sig{str(i).zfill(2)}.pdf'
+    output_files = [os.path.join(workdir, f'sig{str(i).zfill(2)}.pdf')
+                    for i in range(1, len(sig_sizes) + 1)]
 
-        try:
-            subprocess.run(['pdftk', source_file, 'cat', pagenums, 'output', outputnum],
-                         check=True, capture_output=True)
-            print(f'  Created {outputnum} ({sig_size} pages)')
-        except subprocess.CalledProcessError:
-            print(f'  ERROR: Failed to create {outputnum}')
-            return False
+    def report(output_file, pages):
+        print(f'  Created {os.path.basename(output_file)} ({pages} pages)')
 
-        current_page = end_page + 1
+    try:
+        split_pdf(source_file, signature_ranges(sig_sizes), output_files, progress=report)
+    except Exception as e:
+        print(f'  ERROR: Failed to split {source_file}: {e}')
+        return False
 
     return True
 
-def impose_signatures(output_dir):
-    """Run singledingle on all signature files and organize output."""
-    sig_files = sorted([f for f in os.listdir('.') if f.startswith('sig') and f.endswith('.pdf')])
+def impose_signatures(output_dir, workers=None, workdir='.'):
+    """
+    Impose all signature files in workdir 2-up into output_dir (sig01.pdf
+    becomes 01.pdf) and move the signatures there too.
+
+    Imposition runs in-process through ppp.api.impose_signatures, by a
+    pool of at most `workers` processes (default: number of CPU cores).
+    Output is reported in signature order regardless of which worker
+    finishes first, and every failed signature is listed before giving up.
+    """
+    sig_files = sorted([f for f in os.listdir(workdir) if f.startswith('sig') and f.endswith('.pdf')])
 
     if not sig_files:
         print('No signature files found (sig*.pdf)')
         return False
 
-    # Clean up any old PPPsig files from previous runs
-    old_imposed = [f for f in os.listdir('.') if f.startswith('PPPsig') and f.endswith('.pdf')]
-    if old_imposed:
-        print('\nCleaning up old imposed files from previous run...')
-        for old_file in old_imposed:
-            os.remove(old_file)
-            print(f'  Deleted {old_file}')
-
-    print(f'\nImposing {len(sig_files)} signature(s) for 2-up printing...')
-
-    # Check if singledingle is available
-    singledingle_path = shutil.which('singledingle')
-    if singledingle_path is None:
-        print('ERROR: singledingle command not found in PATH')
-        print('Make sure ppp-prepress is installed: pipx install ppp-prepress')
-        return False
-
-    for sig_file in sig_files:
-        print(f'  Imposing {sig_file}...')
-        try:
-            subprocess.run([singledingle_path, sig_file], check=True)
-        except subprocess.CalledProcessError:
-            print(f'  ERROR: Failed to impose {sig_file}')
-            return False
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(sig_files)))
 
-    print('\nImposition complete!')
+    print(f'\nImposing {len(sig_files)} signature(s) for 2-up printing ({workers} worker(s))...')
 
-    # Create output directory
-    os.makedirs(output_dir, exist_ok=True)
+    def report(progress):
+        print(f'  Imposed {sig_files[progress.done - 1]}')
 
-    # Get list of imposed files
-    imposed_files = sorted([f for f in os.listdir('.') if f.startswith('PPPsig') and f.endswith('.pdf')])
-
-    if not imposed_files:
-        print('ERROR: No imposed signature files found (PPPsig*.pdf)')
+    sig_paths = [os.path.join(workdir, f) for f in sig_files]
+    try:
+        results = api.impose_signatures(sig_paths, output_dir, workers=workers, progress=report)
+    except api.ImposeError as e:
+        for _, error in e.failures:
+            print(f'  ERROR: {error}')
+        print(f'\nERROR: {len(e.failures)} of {len(sig_files)} signature(s) failed to impose:')
+        for source, _ in e.failures:
+            print(f'  {os.path.basename(source)}')
         return False
 
-    # Move and rename imposed files to output directory
-    print(f'\nOrganizing files into {output_dir}/')
-    for imposed_file in imposed_files:
-        # Extract number: PPPsig01.pdf -> 01.pdf
-        number = imposed_file.replace('PPPsig', '').replace('.pdf', '')
-        new_name = f'{number}.pdf'
-        src = imposed_file
-        dst = os.path.join(output_dir, new_name)
-        shutil.move(src, dst)
-        print(f'  {imposed_file} → {output_dir}/{new_name}')
+    print('\nImposition complete!')
+    print(f'\nImposed into {output_dir}/')
+    for result in results:
+        note = ' (cached)' if result.cached else ''
+        print(f'  {os.path.basename(result.source)} → {output_dir}/{os.path.basename(result.output)}{note}')
 
     # Move original signature files to output directory (keep them!)
     print('\nMoving original signature files...')
     for sig_file in sig_files:
         dst = os.path.join(output_dir, sig_file)
-        shutil.move(sig_file, dst)
+        shutil.move(os.path.join(workdir, sig_file), dst)
         print(f'  {sig_file} → {output_dir}/{sig_file}')
 
     return True
 
-def combine_signatures(output_dir):
-    """Combine imposed signatures with spacers, limiting to ~200 pages per combined file."""
-    PAGES_PER_COMBINED = 200
-
-    # Find spacer file (1LTRpp.pdf)
-    spacer_file = get_data_path('1LTRpp.pdf')
-
-    if spacer_file is None:
-        print('WARNING: Spacer file (1LTRpp.pdf) not found. Skipping combination.')
-        return False
-
-    # Get list of imposed signature files in output directory (##.pdf, not sig##.pdf)
-    import re
-    sig_files = sorted([f for f in os.listdir(output_dir)
-                       if f.endswith('.pdf') and re.match(r'^\d+\.pdf$', f)])
-
-    if not sig_files:
-        print('ERROR: No signature files found in output directory')
-        return False
-
-    print(f'\nCombining signatures with spacers (max {PAGES_PER_COMBINED} pages per file)...')
-
-    # Calculate page counts for each signature
-    sig_page_counts = []
-    for sig_file in sig_files:
-        full_path = os.path.join(output_dir, sig_file)
-        page_count = get_page_count(full_path)
-        if page_count is None:
-            print(f'WARNING: Could not read {sig_file}, skipping')
-            continue
-        sig_page_counts.append((sig_file, page_count))
-
-    # Get spacer page count (we'll insert it twice for a full double-sided sheet)
-    spacer_pages = get_page_count(spacer_file)
-    if spacer_pages is None:
-        print('ERROR: Could not read spacer file')
-        return False
-
-    spacer_pages_total = spacer_pages * 2  # Insert spacer twice
-
+def _batch_signatures(sig_page_counts, spacer_pages_total):
+    """
+    Group (signature, page_count) pairs into balanced print jobs of at most
+    PAGES_PER_COMBINED pages, counting spacer_pages_total between
+    signatures. Returns a list of batches, each a list of the pairs.
+    """
     # Calculate total pages (including spacers)
     total_sig_pages = sum(pc for _, pc in sig_page_counts)
     total_spacer_pages = (len(sig_page_counts) - 1) * spacer_pages_total  # n-1 spacers
     total_pages = total_sig_pages + total_spacer_pages
 
     # Determine number of batches needed
-    import math
     num_batches = math.ceil(total_pages / PAGES_PER_COMBINED)
     target_per_batch = total_pages / num_batches
 
@@ -368,53 +213,388 @@ def combine_signatures(output_dir):
     if current_batch:
         batches.append(current_batch)
 
+    return batches
+
+def _write_plans(outputs, release=False):
+    """
+    Render (plan, output_file, cache key) triples sharing one set of open
+    sources, copying from the cache instead where the key hits. Runs in a
+    worker process. With release set the sources are closed, and the pages
+    read from them freed, after every file. Returns (files written, cache
+    hits, error or None).
+    """
+    written = []
+    hits = 0
+    try:
+        with pageplan.Sources() as sources:
+            for items, output_file, key in outputs:
+                if cache.fetch(key, output_file):
+                    hits += 1
+                else:
+                    pageplan.write_pdf(items, output_file, sources)
+                    cache.store(key, output_file)
+                written.append(output_file)
+                if release:
+                    sources.close()
+                    # PyPDF2 objects refer back to their reader or writer
+                    gc.collect()
+    except Exception as e:
+        return written, hits, str(e)
+    return written, hits, None
+
+def _plan_key(items):
+    """Cache key for rendering a plan, or None with the cache off."""
+    if not cache.enabled():
+        return None
+    sources, params = pageplan.plan_inputs(items)
+    return cache.make_key('render', sources, params)
+
+def _run_writes(tasks, workers, release=False):
+    """
+    Run _write_plans over tasks, each a list of (plan, output_file), in a
+    process pool (rendering is CPU-bound Python, so threads would
+    serialize). Yields results in task order.
+    """
+    tasks = [[(items, output_file, _plan_key(items)) for items, output_file in task]
+             for task in tasks]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks)))
+    write = functools.partial(_write_plans, release=release)
+    if workers == 1:
+        yield from map(write, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(write, tasks)
+
+def _run_units(units, output_dir, workers, run_state=None, release=False):
+    """
+    Render units of work, each (name, [(plan, output_file), ...]).
+
+    Units that run_state (a manifest) records as finished, with their files
+    still intact, are skipped. Every unit that finishes is recorded and the
+    manifest saved straight away, so an interrupted run loses at most the
+    units in flight. Yields (files, cache hits, error, resumed) per unit,
+    in order.
+    """
+    done = set()
+    if run_state is not None:
+        for name, task in units:
+            expected = [os.path.basename(f) for _, f in task]
+            if manifest.unit_done(run_state, name, output_dir, expected):
+                done.add(name)
+
+    results = _run_writes([task for name, task in units if name not in done], workers, release)
+    for name, task in units:
+        if name in done:
+            yield [f for _, f in task], 0, None, True
+            continue
+        written, hits, error = next(results)
+        if run_state is not None:
+            if error is None:
+                manifest.record_unit(run_state, name, written)
+            else:
+                manifest.forget_unit(run_state, name)
+            manifest.save(output_dir, run_state)
+        yield written, hits, error, False
+
+def write_signatures(signatures, output_dir, impose=True, workers=None, run_state=None,
+                     release=False):
+    """
+    Write planned signatures straight into output_dir.
+
+    Each signature is rendered from the source as sigNN.pdf and, if impose
+    is set, imposed 2-up as NN.pdf; no intermediate files are written.
+    Signatures are independent, so they are rendered by a pool of at most
+    `workers` processes (default: number of CPU cores). With run_state,
+    progress is recorded in the run manifest and finished signatures are
+    skipped. With release set, each signature's pages are freed as soon as
+    its files are written (see --memory-budget).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    units = []
+    for i, pages in enumerate(signatures, 1):
+        number = str(i).zfill(2)
+        outputs = [(pages, os.path.join(output_dir, f'sig{number}.pdf'))]
+        if impose:
+            outputs.append((pageplan.impose(pages), os.path.join(output_dir, f'{number}.pdf')))
+        units.append((f'sig{number}', outputs))
+
+    action = 'Imposing' if impose else 'Writing'
+    print(f'\n{action} {len(signatures)} signature(s) into {output_dir}/...')
+    failures = []
+    results = _run_units(units, output_dir, workers, run_state, release)
+    for i, (written, hits, error, resumed) in enumerate(results, 1):
+        names = ', '.join(os.path.basename(f) for f in written)
+        if error is None:
+            note = ' (already done)' if resumed else ' (cached)' if hits == len(written) else ''
+            print(f'  Signature {i}: {names}{note}')
+        else:
+            print(f'  ERROR: Failed to write signature {i}: {error}')
+            failures.append(i)
+
+    if failures:
+        print(f'\nERROR: {len(failures)} of {len(signatures)} signature(s) failed.')
+        if run_state is not None:
+            print('Fix the problem and run again with --resume to redo only those.')
+        return False
+    return True
+
+def _write_jobs(signatures, output_dir, workers=None, run_state=None):
+    """
+    Write print jobs (job01.pdf, ...) from per-signature plans, with a
+    spacer sheet between signatures and at most ~PAGES_PER_COMBINED pages
+    per job. Each job is rendered in a single write, however many
+    signatures it holds; the spacers are generated blank letter pages.
+    """
+    print(f'\nCombining signatures with spacers (max {PAGES_PER_COMBINED} pages per file)...')
+
+    spacer = [pageplan.blank(LETTER)]
+    spacer_pages_total = len(spacer) * 2  # Insert spacer twice
+    batches = _batch_signatures([(i, len(items)) for i, items in enumerate(signatures)],
+                                spacer_pages_total)
+
     print(f'  Creating {len(batches)} combined file(s)...')
+    units = []
+    for batch_num, batch in enumerate(batches, 1):
+        items = []
+        for j, (i, _) in enumerate(batch):
+            if j:
+                items += spacer * 2  # Spacer twice for a full double-sided sheet
+            items += signatures[i]
+        name = f'job{str(batch_num).zfill(2)}'
+        units.append((name, [(items, os.path.join(output_dir, f'{name}.pdf'))]))
+
+    ok = True
+    results = _run_units(units, output_dir, workers, run_state)
+    for batch, (name, _), (_, hits, error, resumed) in zip(batches, units, results):
+        combined_name = f'{name}.pdf'
+        if error is None:
+            total_pages = sum(pc for _, pc in batch) + (len(batch) - 1) * spacer_pages_total
+            note = ' (already done)' if resumed else ' (cached)' if hits else ''
+            print(f'    Created {combined_name} ({len(batch)} signatures, {total_pages} pages){note}')
+        else:
+            print(f'    ERROR: Failed to create {combined_name}: {error}')
+            ok = False
+
+    if ok:
+        print(f'\nCombined files created in {output_dir}/')
+    return ok
+
+def combine_signatures(output_dir, workers=None):
+    """Combine imposed signatures (##.pdf) in output_dir into print jobs with spacers."""
+    # Get list of imposed signature files in output directory (##.pdf, not sig##.pdf)
+    sig_files = sorted([f for f in os.listdir(output_dir)
+                       if f.endswith('.pdf') and re.match(r'^\d+\.pdf$', f)])
+
+    if not sig_files:
+        print('ERROR: No signature files found in output directory')
+        return False
+
+    signatures = []
+    for sig_file in sig_files:
+        try:
+            signatures.append(pageplan.source_pages(os.path.join(output_dir, sig_file)))
+        except ProbeError:
+            print(f'WARNING: Could not read {sig_file}, skipping')
+
+    return _write_jobs(signatures, output_dir, workers)
+
+def combine_plans(signatures, output_dir, workers=None, run_state=None):
+    """
+    Write print jobs for planned signatures, imposing each one straight
+    from the source instead of re-reading the imposed ##.pdf files.
+    """
+    return _write_jobs([pageplan.impose(pages) for pages in signatures], output_dir, workers,
+                       run_state)
+
+def combine_streamed(output_dir, count, workdir, run_state=None):
+    """
+    Write print jobs for the memory budget: the imposed signatures already
+    in output_dir (01.pdf, ...) are streamed into each job one file at a
+    time (see ppp.streammerge), so no job is ever held in memory whole.
+    Jobs are batched and spaced as by _write_jobs.
+    """
+    print(f'\nCombining signatures with spacers (max {PAGES_PER_COMBINED} pages per file)...')
+
+    spacer = os.path.join(workdir, 'spacer.pdf')
+    pageplan.write_pdf([pageplan.blank(LETTER)] * 2, spacer)  # A full double-sided sheet
+    sig_files = [os.path.join(output_dir, f'{str(i).zfill(2)}.pdf') for i in range(1, count + 1)]
+    batches = _batch_signatures([(f, get_page_count(f) or 0) for f in sig_files], 2)
 
-    # Create combined files
+    print(f'  Creating {len(batches)} combined file(s)...')
+    ok = True
     for batch_num, batch in enumerate(batches, 1):
-        combined_name = f'job{str(batch_num).zfill(2)}.pdf'
-        combined_path = os.path.join(output_dir, combined_name)
-
-        # Build pdftk command with spacers between signatures
-        cmd = ['pdftk']
-
-        # Add all files as inputs (A=first sig, B=spacer, C=second sig, etc.)
-        file_labels = []
-        for i, (sig_file, _) in enumerate(batch):
-            label = chr(65 + i * 2)  # A, C, E, G, ...
-            cmd.append(f'{label}={os.path.join(output_dir, sig_file)}')
-            file_labels.append(label)
-
-        # Add spacer as all the even letters (B, D, F, H, ...)
-        for i in range(len(batch) - 1):
-            label = chr(66 + i * 2)  # B, D, F, H, ...
-            cmd.append(f'{label}={spacer_file}')
-
-        # Build cat sequence: A B B C D D E ... (sig, spacer twice, sig, spacer twice, sig)
-        cmd.append('cat')
-        for i, label in enumerate(file_labels):
-            cmd.append(label)
-            if i < len(file_labels) - 1:  # Add spacer twice after all but last
-                spacer_label = chr(66 + i * 2)
-                cmd.append(spacer_label)
-                cmd.append(spacer_label)  # Insert spacer twice for full double-sided sheet
-
-        cmd.extend(['output', combined_path])
-
-        # Execute
+        name = f'job{str(batch_num).zfill(2)}'
+        combined_name = f'{name}.pdf'
+        if run_state is not None and manifest.unit_done(run_state, name, output_dir, [combined_name]):
+            print(f'    {combined_name} (already done)')
+            continue
+        inputs = []
+        for sig_file, _ in batch:
+            inputs += [spacer, sig_file] if inputs else [sig_file]
         try:
-            subprocess.run(cmd, check=True, capture_output=True)
-            total_pages = sum(pc for _, pc in batch) + (len(batch) - 1) * spacer_pages_total
-            print(f'    Created {combined_name} ({len(batch)} signatures, {total_pages} pages)')
-        except subprocess.CalledProcessError as e:
-            print(f'    ERROR: Failed to create {combined_name}')
-            return False
+            total_pages = stream_merge(inputs, os.path.join(output_dir, combined_name))
+        except Exception as e:
+            print(f'    ERROR: Failed to create {combined_name}: {e}')
+            if run_state is not None:
+                manifest.forget_unit(run_state, name)
+                manifest.save(output_dir, run_state)
+            ok = False
+            continue
+        if run_state is not None:
+            manifest.record_unit(run_state, name, [os.path.join(output_dir, combined_name)])
+            manifest.save(output_dir, run_state)
+        print(f'    Created {combined_name} ({len(batch)} signatures, {total_pages} pages)')
+
+    if ok:
+        print(f'\nCombined files created in {output_dir}/')
+    return ok
+
+def _report_memory(budget):
+    """Print the run's peak memory use against the --memory-budget."""
+    own, tools = trace.peak_rss()
+    print(f'Peak memory: {own / 2 ** 20:.0f} MB '
+          f'(external tools: {tools / 2 ** 20:.0f} MB), budget {budget / 2 ** 20:.0f} MB')
+    if max(own, tools) > budget:
+        print('WARNING: The run went over its memory budget.')
+
+def _parse_signatures(text):
+    """Parse a signature list such as "32,32,28" into [32, 32, 28]."""
+    try:
+        return parse_sig_sizes(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def _load_config(filename):
+    """Read workflow options from a JSON config file."""
+    with open(filename) as f:
+        config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError('config file must contain a JSON object')
+    return {key.replace('-', '_'): value for key, value in config.items()}
+
+EXIT_CODES_HELP = f"""
+exit codes:
+  {EXIT_OK}  success
+  {EXIT_FAILURE}  a processing step failed (resize, padding, splitting, imposition, combining)
+  {EXIT_USAGE}  invalid command-line option, config file or answer
+  {EXIT_INPUT}  source file missing or unreadable
+  {EXIT_NO_PLAN}  no usable signature configuration
+  {EXIT_SKIPPED}  stopped before producing output (quit, or letter-size book printed as-is)
+  {EXIT_NEEDS_INPUT}  a question needed an answer but stdin was closed
+"""
 
-    print(f'\nCombined files created in {output_dir}/')
-    return True
+def parse_args(argv=None):
+    """
+    Parse command-line options for the ppp workflow.
+
+    Every interactive question has a matching option, so the workflow can
+    run unattended. Options may also come from a JSON config file
+    (--config) whose keys are the long option names; explicit
+    command-line options win over the file.
+    """
+    parser = argparse.ArgumentParser(
+        prog='ppp',
+        description='Prepare a PDF for signature-based book printing.',
+        epilog=EXIT_CODES_HELP,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('source', nargs='?', help='source PDF file (prompted for if omitted)')
+    parser.add_argument('--config', metavar='FILE',
+                        help='read default options from a JSON file')
+    parser.add_argument('-y', '--yes', action='store_true', default=False,
+                        help='answer every question with its default: continue with large pages, '
+                             'resize, take the top suggestion, impose and combine')
+    parser.add_argument('--large-pages', choices=['print', 'continue'],
+                        help='for letter-size sources: stop and print as-is, or continue the workflow')
+    parser.add_argument('--resize', action=argparse.BooleanOptionalAction,
+                        help='resize pages to half-letter first')
+    parser.add_argument('--gs-resize', action='store_true', default=False,
+                        help='resize with a ghostscript pass instead of in-process scaling '
+                             '(slower; re-encodes fonts and images)')
+    parser.add_argument('--choice', type=int, metavar='N',
+                        help='use the Nth suggested signature configuration')
+    parser.add_argument('--signatures', type=_parse_signatures, metavar='LIST',
+                        help='explicit signature sizes, e.g. 32,32,28 (overrides suggestions)')
+    parser.add_argument('--impose', action=argparse.BooleanOptionalAction,
+                        help='impose the signatures 2-up after splitting')
+    parser.add_argument('--combine', action=argparse.BooleanOptionalAction,
+                        help='combine imposed signatures into print jobs')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='signatures to impose concurrently (default: number of CPU cores)')
+    parser.add_argument('--memory-budget', type=cache.parse_size, default=None, metavar='SIZE',
+                        help='keep memory use down for very large books: process one signature at '
+                             'a time, freeing its pages once written, stream print jobs together '
+                             'and report peak memory against SIZE, e.g. 512M')
+    parser.add_argument('--tmpfs', action='store_true', default=False,
+                        help='keep intermediate files on /dev/shm instead of disk')
+    parser.add_argument('--resume', action='store_true', default=False,
+                        help='continue an interrupted run of this file: replay its answers from '
+                             'the manifest in the output directory and skip finished signatures')
+    parser.add_argument('--cache', action=argparse.BooleanOptionalAction, default=True,
+                        help='reuse results from earlier runs (content-addressed; also: PPP_CACHE=0)')
+    parser.add_argument('--cache-size', type=cache.parse_size, default=None, metavar='SIZE',
+                        help='keep the result cache under SIZE, e.g. 500M or 4G '
+                             '(default: PPP_CACHE_SIZE or 2G)')
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help='record a timing trace of every stage and external command: '
+                             'JSON lines if FILE ends in .jsonl, else Chrome trace format '
+                             '(also: PPP_TRACE=FILE)')
+    parser.add_argument('--probe-cache', action='store_true', default=False,
+                        help='remember page counts and sizes across runs (also: PPP_PROBE_CACHE=1)')
+
+    args = parser.parse_args(argv)
+    if args.config:
+        try:
+            config = _load_config(args.config)
+        except (OSError, ValueError) as e:
+            parser.error(f'could not read config file {args.config}: {e}')
+        unknown = sorted(set(config) - (set(vars(args)) - {'config'}))
+        if unknown:
+            parser.error(f'unknown option(s) in {args.config}: {", ".join(unknown)}')
+        if 'signatures' in config:
+            try:
+                config['signatures'] = _parse_signatures(config['signatures'])
+            except argparse.ArgumentTypeError as e:
+                parser.error(str(e))
+        parser.set_defaults(**config)
+        args = parser.parse_args(argv)
+    return args
+
+def _ask(prompt, preset=None):
+    """
+    Ask a question, or answer it with preset when one was given up front.
+
+    Exits with EXIT_NEEDS_INPUT instead of hanging or crashing when stdin
+    is closed, so unattended runs fail with a recognisable code.
+    """
+    print(prompt, end='')
+    if preset is not None:
+        print(preset)
+        return preset
+    try:
+        return input().strip().lower()
+    except EOFError:
+        print()
+        print('ERROR: An answer is needed but stdin is closed. Pass it as an option (see ppp --help).')
+        sys.exit(EXIT_NEEDS_INPUT)
+
+def _yes_no(flag, yes):
+    """Preset answer for a yes/no question from its option and --yes."""
+    if flag is None:
+        return 'y' if yes else None
+    return 'y' if flag else 'n'
 
 def main():
     """Main workflow orchestrator."""
+    args = parse_args()
+    if args.probe_cache:
+        enable_persistent_cache()
+    cache.configure(enabled=args.cache and cache.enabled(), max_bytes=args.cache_size)
+    if args.trace:
+        trace.configure(args.trace)
+
     print('=' * 60)
     print("PAUL'S PREPONDERATING PREPRESSER v1.1")
     print('Automated Workflow for Signature Preparation')
@@ -422,38 +602,153 @@ def main():
     print()
 
     # Get source file
-    if len(sys.argv) > 1:
-        original_source = sys.argv[1]
+    if args.source:
+        original_source = args.source
     else:
-        original_source = input('Source PDF file: ').strip()
+        try:
+            original_source = input('Source PDF file: ').strip()
+        except EOFError:
+            print()
+            print('ERROR: No source file given and stdin is closed.')
+            sys.exit(EXIT_NEEDS_INPUT)
 
     if not original_source.endswith('.pdf'):
         original_source += '.pdf'
 
     if not os.path.isfile(original_source):
         print(f'ERROR: File "{original_source}" not found.')
-        sys.exit(1)
+        sys.exit(EXIT_INPUT)
+
+    # Every intermediate file goes into a private scratch directory, so
+    # several runs can share a working directory without interfering.
+    workdir = make_scratch_dir('ppp-', tmpfs=args.tmpfs)
+    try:
+        run_workflow(original_source, workdir, args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        if cache.enabled():
+            cache.evict()
+
+def _gs_resize(source_file, workdir):
+    """
+    Fit every page to half-letter with a ghostscript pdfwrite pass, into
+    workdir. This re-encodes the whole document, so it is only used when
+    asked for (--gs-resize). Returns the resized file; exits on failure.
+    """
+    base, ext = os.path.splitext(os.path.basename(source_file))
+    resized_file = os.path.join(workdir, f'{base}-halfletter{ext}')
+
+    key = (cache.make_key('gs-resize', [source_file], {'size': HALF_LETTER}, tools=('gs',))
+           if cache.enabled() else None)
+    if cache.fetch(key, resized_file):
+        print(f'Created {resized_file} (cached)')
+        return resized_file
+
+    try:
+        # Use ghostscript to resize/fit pages to 5.5 x 8.5 inches
+        # 5.5" = 396 points, 8.5" = 612 points (72 points per inch)
+        cmd = [
+            'gs',
+            '-sPAPERSIZE=custom',
+            '-dFIXEDMEDIA',
+            '-dPDFFitPage',
+            '-dDEVICEWIDTHPOINTS=396',   # 5.5 inches
+            '-dDEVICEHEIGHTPOINTS=612',  # 8.5 inches
+            '-dNOPAUSE',
+            '-dBATCH',
+            '-dSAFER',
+            '-sDEVICE=pdfwrite',
+            '-sOutputFile=' + resized_file,
+            source_file
+        ]
+        trace.run(cmd, check=True, capture_output=True, inputs=[source_file],
+                  outputs=[resized_file])
+        cache.store(key, resized_file)
+        print(f'Created {resized_file}')
+        return resized_file
 
-    # Track temporary files for cleanup
-    temp_files = []
+    except subprocess.CalledProcessError as e:
+        print('ERROR: ghostscript (gs) failed to resize PDF')
+        if sys.platform == 'darwin':
+            print('Make sure ghostscript is installed: brew install ghostscript')
+        else:
+            print('Make sure ghostscript is installed: sudo apt install ghostscript')
+        sys.exit(EXIT_FAILURE)
+    except FileNotFoundError:
+        print('ERROR: ghostscript (gs) not found')
+        if sys.platform == 'darwin':
+            print('Install it with: brew install ghostscript')
+        else:
+            print('Install it with: sudo apt install ghostscript')
+        sys.exit(EXIT_FAILURE)
+
+def _output_files(output_dir, pattern):
+    """Files in output_dir whose whole name matches pattern, for trace byte counts."""
+    try:
+        names = os.listdir(output_dir)
+    except OSError:
+        return []
+    return [os.path.join(output_dir, name) for name in sorted(names) if re.fullmatch(pattern, name)]
+
+def _find_manifest(source):
+    """Find the manifest of an earlier run on source: (output_dir, manifest) or None."""
+    base = os.path.splitext(os.path.basename(source))[0]
+    for output_dir in (f'{base}-output', f'{base}-halfletter-output'):
+        previous = manifest.load(output_dir)
+        if previous is not None and manifest.matches_source(previous, source):
+            return output_dir, previous
+    return None
+
+def _replay_answers(options, answers):
+    """Answer every question the way the manifest's run did."""
+    options.large_pages = answers.get('large_pages', options.large_pages)
+    for key in ('resize', 'gs_resize', 'signatures', 'impose', 'combine'):
+        if key in answers:
+            setattr(options, key, answers[key])
+
+def run_workflow(original_source, workdir, options):
+    """
+    Run the workflow, using workdir for intermediate files.
+
+    options is the namespace from parse_args(); any question it already
+    answers is not asked. Progress is recorded in a manifest in the output
+    directory; with options.resume, an earlier run's answers are replayed
+    and its finished signatures and jobs are kept.
+    """
     source_file = original_source
 
     # Get page count
-    page_count = get_page_count(source_file)
+    with trace.span('probe', inputs=[source_file]):
+        page_count = get_page_count(source_file)
     if page_count is None:
-        sys.exit(1)
+        sys.exit(EXIT_INPUT)
+
+    # Under a memory budget signatures are done one at a time, in this
+    # process, each freed once written
+    budget = options.memory_budget
+    workers = 1 if budget else options.workers
+    if budget:
+        print(f'Memory budget: {budget / 2 ** 20:.0f} MB; processing one signature at a time.')
+
+    # Answers that shaped this run, recorded in the manifest for --resume
+    answers = {}
+    previous = None
+    if options.resume:
+        previous = _find_manifest(original_source)
+        if previous is None:
+            print('No earlier run of this file to resume; starting afresh.')
+        else:
+            print(f'Resuming the run recorded in {previous[0]}/')
+            _replay_answers(options, previous[1]['answers'])
 
-    # Detect page size
+    # Detect page size (already probed along with the page count)
+    page_size = HALF_LETTER  # Size for blank padding pages
+    resize_to = None
     try:
-        with open(source_file, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            first_page = reader.pages[0]
-            mediabox = first_page.mediabox
-            width_pts = float(mediabox.width)
-            height_pts = float(mediabox.height)
-            width_in = width_pts / 72  # Convert points to inches
-            height_in = height_pts / 72
-    except Exception as e:
+        page_size = width_pts, height_pts = probe(source_file).page_sizes[0]
+        width_in = width_pts / 72  # Convert points to inches
+        height_in = height_pts / 72
+    except (ProbeError, KeyError):
         # If we can't detect size, just continue
         width_in = 0
         height_in = 0
@@ -475,8 +770,10 @@ def main():
         print('  1. Print as-is on letter-size paper (1-up, double-sided)')
         print('  2. Continue with signature workflow (resize to half-letter)')
         print()
-        print('Your choice [1/2]: ', end='')
-        size_choice = input().strip()
+        preset = {'print': '1', 'continue': '2'}.get(options.large_pages)
+        if preset is None and options.yes:
+            preset = '2'
+        size_choice = _ask('Your choice [1/2]: ', preset)
 
         if size_choice == '1':
             print()
@@ -486,10 +783,11 @@ def main():
             print('  3. No signature splitting needed!')
             print()
             print('Exiting workflow.')
-            sys.exit(0)
+            sys.exit(EXIT_SKIPPED)
         elif size_choice != '2':
             print('Invalid choice. Exiting.')
-            sys.exit(1)
+            sys.exit(EXIT_USAGE)
+        answers['large_pages'] = 'continue'
         # If choice is 2, continue below
 
     # Check if source is already 5.5 × 8.5 inches (allow 0.1 inch tolerance)
@@ -501,62 +799,43 @@ def main():
         print()
     else:
         # Ask about resizing to half-letter
-        print('Resize pages to half-letter size (5.5 × 8.5 in) first? [y/n] [DEFAULT: yes]: ', end='')
-        resize_response = input().strip().lower()
+        resize_response = _ask('Resize pages to half-letter size (5.5 × 8.5 in) first? [y/n] [DEFAULT: yes]: ',
+                               _yes_no(options.resize, options.yes))
 
+        answers['resize'] = resize_response in ['y', 'yes', '']
+        answers['gs_resize'] = options.gs_resize
         if resize_response in ['y', 'yes', '']:
-            print('Resizing pages to half-letter...')
-            base, ext = os.path.splitext(source_file)
-            resized_file = f'{base}-halfletter{ext}'
-
-            try:
-                # Use ghostscript to resize/fit pages to 5.5 x 8.5 inches
-                # 5.5" = 396 points, 8.5" = 612 points (72 points per inch)
-                cmd = [
-                    'gs',
-                    '-sPAPERSIZE=custom',
-                    '-dFIXEDMEDIA',
-                    '-dPDFFitPage',
-                    '-dDEVICEWIDTHPOINTS=396',   # 5.5 inches
-                    '-dDEVICEHEIGHTPOINTS=612',  # 8.5 inches
-                    '-dNOPAUSE',
-                    '-dBATCH',
-                    '-dSAFER',
-                    '-sDEVICE=pdfwrite',
-                    '-sOutputFile=' + resized_file,
-                    source_file
-                ]
-                subprocess.run(cmd, check=True, capture_output=True)
-                print(f'Created {resized_file}')
-
-                # Update source to use resized file and track for cleanup
-                source_file = resized_file
-                temp_files.append(resized_file)
+            page_size = HALF_LETTER
+            if options.gs_resize:
+                print('Resizing pages to half-letter with ghostscript...')
+                with trace.span('gs-resize', inputs=[source_file]) as span:
+                    source_file = _gs_resize(source_file, workdir)
+                    span['outputs'].append(source_file)
 
                 # Recalculate page count (shouldn't change, but be thorough)
                 page_count = get_page_count(source_file)
                 if page_count is None:
-                    sys.exit(1)
-
-            except subprocess.CalledProcessError as e:
-                print('ERROR: ghostscript (gs) failed to resize PDF')
-                if sys.platform == 'darwin':
-                    print('Make sure ghostscript is installed: brew install ghostscript')
-                else:
-                    print('Make sure ghostscript is installed: sudo apt install ghostscript')
-                sys.exit(1)
-            except FileNotFoundError:
-                print('ERROR: ghostscript (gs) not found')
-                if sys.platform == 'darwin':
-                    print('Install it with: brew install ghostscript')
-                else:
-                    print('Install it with: sudo apt install ghostscript')
-                sys.exit(1)
+                    sys.exit(EXIT_FAILURE)
+            else:
+                # Scale each page onto a half-letter page when the output is
+                # rendered; contents, fonts and images are not re-encoded
+                print('Resizing pages to half-letter...')
+                resize_to = HALF_LETTER
 
         print()
 
+    if options.signatures:
+        # Explicit configuration from the command line or config file
+        sig_config = options.signatures
+        pages_to_add = sum(sig_config) - page_count
+        if pages_to_add < 0:
+            print(f'ERROR: Signatures hold {sum(sig_config)} pages but the document has {page_count}.')
+            sys.exit(EXIT_NO_PLAN)
+        print(f'Configuration: {" + ".join(map(str, sig_config))} pages')
+        if pages_to_add > 0:
+            print(f'Padding: {pages_to_add} blank page(s) will be added')
     # Handle very small PDFs automatically (≤16 pages)
-    if page_count <= 16:
+    elif page_count <= 16:
         print('Small PDF detected - processing automatically...')
 
         # Calculate padding needed to reach next multiple of 4
@@ -577,7 +856,7 @@ def main():
 
         if not suggestions:
             print('ERROR: Could not find suitable signature configuration.')
-            sys.exit(1)
+            sys.exit(EXIT_NO_PLAN)
 
         # Show suggestions
         for i, (desc, sig_config, pages_to_add) in enumerate(suggestions, 1):
@@ -586,16 +865,23 @@ def main():
             else:
                 print(f'  {i}. {desc} (add {pages_to_add} blank pages)')
 
+        preset = options.choice
+        if preset is None and options.yes:
+            preset = 1
+        if preset is not None and not 1 <= preset <= len(suggestions):
+            print(f'ERROR: --choice must be between 1 and {len(suggestions)}.')
+            sys.exit(EXIT_USAGE)
+
         # Get user choice with validation loop
         while True:
             print()
-            print(f'Choose a configuration [1-{len(suggestions)}], or q to quit: ', end='')
-            choice = input().strip().lower()
+            choice = _ask(f'Choose a configuration [1-{len(suggestions)}], or q to quit: ',
+                          None if preset is None else str(preset))
 
             # Check for quit
             if choice in ['q', 'quit']:
                 print('Aborted.')
-                sys.exit(0)
+                sys.exit(EXIT_SKIPPED)
 
             # Parse choice
             try:
@@ -615,73 +901,95 @@ def main():
         if pages_to_add > 0:
             print(f'Padding: {pages_to_add} blank page(s) will be added')
 
-    # Pad if needed
-    working_file = source_file
-    if pages_to_add > 0:
-        print()
-        working_file = pad_pdf(source_file, pages_to_add)
-        if working_file is None:
-            sys.exit(1)
-        temp_files.append(working_file)
+    # Pad and split in memory; pages are only read and written when the
+    # deliverables are rendered
+    with trace.span('plan', inputs=[source_file], signatures=sig_config, blank_pages=pages_to_add):
+        pages = pageplan.source_pages(source_file)
+        if resize_to is not None:
+            pages = pageplan.resize(pages, resize_to)
+        if pages_to_add > 0:
+            print()
+            print(f'Adding {pages_to_add} blank page(s)...')
+            pages = pageplan.pad(pages, pages_to_add, page_size)
 
-    # Split into signatures
-    print()
-    if not split_into_signatures(working_file, sig_config):
-        sys.exit(1)
+        print()
+        print(f'Splitting {os.path.basename(source_file)} into {len(sig_config)} signature(s)...')
+        signatures = pageplan.split(pages, sig_config)
+    first = 1
+    for i, size in enumerate(sig_config, 1):
+        print(f'  sig{str(i).zfill(2)}: pages {first}-{first + size - 1} ({size} pages)')
+        first += size
 
     # Create output directory name from source filename
     base_name = os.path.splitext(os.path.basename(source_file))[0]
+    if resize_to is not None:
+        base_name += '-halfletter'  # Same name the ghostscript resize gives
     output_dir = f'{base_name}-output'
 
+    answers['signatures'] = sig_config
+    if previous is not None and previous[0] == output_dir:
+        run_state = previous[1]
+    else:
+        run_state = manifest.new_manifest(original_source, answers)
+    manifest.stage_done(run_state, 'plan')
+    manifest.save(output_dir, run_state)
+
     # Ask about imposition
     print()
-    print('Split complete! Would you like to impose the signatures now? [y/n] [DEFAULT: yes]: ', end='')
-    response = input().strip().lower()
+    response = _ask('Split complete! Would you like to impose the signatures now? [y/n] [DEFAULT: yes]: ',
+                    _yes_no(options.impose, options.yes))
+    run_state['answers']['impose'] = response in ['y', 'yes', '']
 
     if response in ['y', 'yes', '']:
-        if not impose_signatures(output_dir):
-            sys.exit(1)
-
-        # Clean up temporary files
-        for temp_file in temp_files:
-            if os.path.isfile(temp_file):
-                os.remove(temp_file)
+        with trace.span('impose', inputs=[source_file], signatures=len(sig_config)) as span:
+            ok = write_signatures(signatures, output_dir, impose=True, workers=workers,
+                                  run_state=run_state, release=bool(budget))
+            span['outputs'].extend(_output_files(output_dir, r'(sig)?\d+\.pdf'))
+        if not ok:
+            sys.exit(EXIT_FAILURE)
+        manifest.stage_done(run_state, 'impose')
+        manifest.save(output_dir, run_state)
+        print('\nImposition complete!')
 
         # Only ask about combining if there are multiple signatures
         if len(sig_config) > 1:
             # Ask about combining
             print()
-            print('Would you like to combine signatures with spacers for easier printing? [y/n] [DEFAULT: yes]: ', end='')
-            combine_response = input().strip().lower()
+            combine_response = _ask('Would you like to combine signatures with spacers for easier printing? '
+                                    '[y/n] [DEFAULT: yes]: ', _yes_no(options.combine, options.yes))
+            run_state['answers']['combine'] = combine_response in ['y', 'yes', '']
 
             if combine_response in ['y', 'yes', '']:
-                if combine_signatures(output_dir):
+                with trace.span('combine', inputs=[source_file]) as span:
+                    if budget:
+                        ok = combine_streamed(output_dir, len(signatures), workdir, run_state)
+                    else:
+                        ok = combine_plans(signatures, output_dir, workers, run_state)
+                    span['outputs'].extend(_output_files(output_dir, r'job\d+\.pdf'))
+                if ok:
+                    manifest.stage_done(run_state, 'combine')
+                    manifest.save(output_dir, run_state)
                     print(f'\n✓ All files ready in {output_dir}/')
                     print('  - Individual signatures: 01.pdf, 02.pdf, ...')
                     print('  - Print jobs: job01.pdf, job02.pdf, ...')
                 else:
-                    print(f'\n✓ Individual signatures ready in {output_dir}/')
+                    print(f'\nERROR: Combining failed; the individual signatures are in {output_dir}/')
+                    sys.exit(EXIT_FAILURE)
             else:
                 print(f'\n✓ Individual signatures ready in {output_dir}/')
         else:
             # Single signature - no need to combine
             print(f'\n✓ Single signature ready in {output_dir}/')
     else:
-        # User declined imposition - move sig files to output dir anyway
-        print()
-        print('Organizing signature files...')
-        os.makedirs(output_dir, exist_ok=True)
-
-        sig_files = sorted([f for f in os.listdir('.') if f.startswith('sig') and f.endswith('.pdf')])
-        for sig_file in sig_files:
-            dst = os.path.join(output_dir, sig_file)
-            shutil.move(sig_file, dst)
-            print(f'  {sig_file} → {output_dir}/{sig_file}')
-
-        # Clean up temporary files
-        for temp_file in temp_files:
-            if os.path.isfile(temp_file):
-                os.remove(temp_file)
+        # User declined imposition - write the sig files only
+        with trace.span('split', inputs=[source_file], signatures=len(sig_config)) as span:
+            ok = write_signatures(signatures, output_dir, impose=False, workers=workers,
+                                  run_state=run_state, release=bool(budget))
+            span['outputs'].extend(_output_files(output_dir, r'sig\d+\.pdf'))
+        if not ok:
+            sys.exit(EXIT_FAILURE)
+        manifest.stage_done(run_state, 'split')
+        manifest.save(output_dir, run_state)
 
         print(f'\n✓ Signature files ready in {output_dir}/')
         print('  To impose later:')
@@ -689,6 +997,8 @@ def main():
         print(f'    fppp')
 
     print()
+    if budget:
+        _report_memory(budget)
     print('Workflow complete!')
 
 if __name__ == '__main__':